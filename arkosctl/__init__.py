@@ -1,7 +1,7 @@
 """Sets up main command groups and authentication."""
 import click
+import importlib
 import os
-import pyarkosclient
 import sys
 
 try:
@@ -10,6 +10,7 @@ try:
 except ImportError:
     # Python 3
     import configparser
+from arkosctl.connection import get_client
 from arkosctl.logs import LoggingControl
 
 version = "0.3"
@@ -17,6 +18,7 @@ logger = LoggingControl()
 
 
 def client():
+    """Return the API client for this invocation (connects on first use)."""
     return click.get_current_context().obj["client"]
 
 
@@ -30,8 +32,14 @@ class CLIException(click.ClickException):
 
 
 def get_arkosrc():
-    """Get default configuration options from ~/.arkosrc."""
+    """Get default configuration options from ~/.arkosrc.
+
+    Nothing is read if ARKOS_CLI_NO_RC is set, as for the processes run by
+    `--hosts`, which must only use the host and credentials given to them.
+    """
     default_map = {}
+    if os.environ.get("ARKOS_CLI_NO_RC"):
+        return default_map
     if os.path.exists(os.path.join(os.path.expanduser("~"), ".arkosrc")):
         cfg = configparser.SafeConfigParser()
         cfg.read(os.path.join(os.path.expanduser("~"), ".arkosrc"))
@@ -40,39 +48,84 @@ def get_arkosrc():
     return default_map
 
 
+# Static manifest of top-level command groups, so that `--help` can be
+# listed and a single subcommand resolved without importing every framework.
+FRAMEWORKS = {
+    "app": ("applications", "applications", "Application commands."),
+    "agent": ("agent", "agent", "Serve commands over a local socket."),
+    "backup": ("backups", "backups", "Backup commands."),
+    "batch": ("batch", "batch", "Run arkosctl command lines from a file."),
+    "cert": ("certificates", "certificates",
+             "SSL/TLS Certificates commands."),
+    "completion": ("completion", "completion", "Shell completion commands."),
+    "db": ("databases", "db", "Database commands."),
+    "dbuser": ("databases", "db_users", "Database user commands."),
+    "domain": ("roles", "domain", "Domain commands (LDAP)"),
+    "file": ("files", "files", "File commands."),
+    "fs": ("filesystems", "fs", "Filesystem commands."),
+    "group": ("roles", "group", "Group commands (LDAP)"),
+    "job": ("jobs", "jobs", "Background job commands."),
+    "keys": ("apikeys", "keys", "API Keys commands."),
+    "link": ("files", "links", "Shared file commands."),
+    "net": ("networks", "networks", "Network commands"),
+    "pkg": ("packages", "packages", "System package commands"),
+    "sec": ("security", "security", "Security commands"),
+    "shell": ("shell", "shell",
+              "Interactive shell over a single connection."),
+    "sites": ("websites", "websites", "Website commands"),
+    "svc": ("services", "services", "Service commands"),
+    "sys": ("system", "system", "System commands"),
+    "user": ("roles", "user", "User commands (LDAP)")
+}
+
+
+class LazyGroup(click.Group):
+    """Command group that imports framework modules only when invoked."""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        """Reimplement to read ~/.arkosrc for each invocation."""
+        if parent is None:
+            extra.setdefault("default_map", get_arkosrc())
+        return click.Group.make_context(
+            self, info_name, args, parent=parent, **extra)
+
+    def list_commands(self, ctx):
+        """Reimplement to include manifest entries."""
+        return sorted(set(self.commands) | set(FRAMEWORKS))
+
+    def get_command(self, ctx, cmd_name):
+        """Reimplement to import the framework module on first use."""
+        if cmd_name not in self.commands and cmd_name in FRAMEWORKS:
+            module, attr, _ = FRAMEWORKS[cmd_name]
+            mod = importlib.import_module("arkosctl.frameworks." + module)
+            self.add_command(getattr(mod, attr), cmd_name)
+        return self.commands.get(cmd_name)
+
+    def invoke(self, ctx):
+        """Reimplement to keep the subcommand line for `--hosts`."""
+        ctx.meta["arkosctl.args"] = ctx.protected_args + ctx.args
+        return click.Group.invoke(self, ctx)
+
+    def format_commands(self, ctx, formatter):
+        """Reimplement to list commands from the manifest without imports."""
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.commands:
+                rows.append((name, self.commands[name].short_help or ""))
+            else:
+                rows.append((name, FRAMEWORKS[name][2]))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+
 def register_frameworks():
-    from arkosctl.frameworks import (
-        apikeys, applications, backups, certificates, databases, files,
-        filesystems, networks, packages, roles, security, services, system,
-        websites
-    )
-
-    modgroups = [
-        apikeys.keys,
-        applications.applications,
-        backups.backups,
-        certificates.certificates,
-        databases.db,
-        databases.db_users,
-        files.files,
-        files.links,
-        filesystems.fs,
-        networks.networks,
-        packages.packages,
-        roles.user,
-        roles.group,
-        roles.domain,
-        security.security,
-        services.services,
-        system.system,
-        websites.websites
-    ]
-
-    for x in modgroups:
-        main.add_command(x)
-
-
-@click.group(context_settings={"default_map": get_arkosrc()})
+    """Eagerly load all command groups (not needed for normal invocation)."""
+    for name in FRAMEWORKS:
+        main.get_command(None, name)
+
+
+@click.group(cls=LazyGroup)
 @click.option("--host", envvar="ARKOS_CLI_HOST", default="",
               help="Connect to remote arkOS server (host:port)")
 @click.option("--user", envvar="ARKOS_CLI_USER", default="",
@@ -81,29 +134,78 @@ def register_frameworks():
               help="Password for remote connection")
 @click.option("--apikey", envvar="ARKOS_CLI_APIKEY", default="",
               help="API key for remote connection")
+@click.option("--timeout", envvar="ARKOS_CLI_TIMEOUT", type=float, default=0,
+              help="Maximum seconds to wait for a job (0 waits forever)")
+@click.option("--poll-min", envvar="ARKOS_CLI_POLL_MIN", type=float,
+              default=0.25, help="Initial seconds between job status checks")
+@click.option("--poll-max", envvar="ARKOS_CLI_POLL_MAX", type=float,
+              default=10.0, help="Maximum seconds between job status checks")
+@click.option("--no-cache", is_flag=True, envvar="ARKOS_CLI_NO_CACHE",
+              help="Do not use cached responses for listings")
 @click.option("-v/--verbose", envvar="ARKOS_CLI_VERBOSE", default=False,
               help="Verbose output")
+@click.option("-o", "--output", envvar="ARKOS_CLI_OUTPUT", default="text",
+              type=click.Choice(["text", "json", "ndjson", "csv"]),
+              help="Format of listings (default: text)")
+@click.option("--hosts", envvar="ARKOS_CLI_HOSTS", default="",
+              help="Run on every host of these inventory groups")
+@click.option("--hosts-limit", type=click.IntRange(1, 256), default=8,
+              help="Maximum number of hosts to run on at the same time")
+@click.option("--hosts-format", type=click.Choice(["prefix", "json"]),
+              default="prefix", help="How to show the output of each host")
 @click.pass_context
-def main(ctx, host, user, password, apikey, v):
+def main(ctx, host, user, password, apikey, timeout, poll_min, poll_max,
+         no_cache, v, output, hosts, hosts_limit, hosts_format):
     """Main command tree."""
-    ctx.obj = {}
+    ctx.obj = {
+        "poll": {"initial": poll_min, "maximum": poll_max, "timeout": timeout},
+        "output": output
+    }
     logger.add_stream_logger(debug=v)
-    if sys.argv[-1] == "--help":
-        # Connection not required
-        return
-    if host and ((user and password) or apikey):
-        try:
-            ctx.obj["client"] = pyarkosclient.arkOS(
-                host, user, password, api_key=apikey)
-        except Exception as e:
-            raise CLIException(str(e))
-    else:
-        raise CLIException(
-            "No connection information specified for remote host.")
+    if hosts:
+        run_fleet(ctx, hosts, hosts_limit, hosts_format)
+    ctx.obj["client"] = get_client(host, user, password, apikey)
+    ctx.obj["client"].responses.enabled = not no_cache
+
+
+def run_fleet(ctx, spec, limit, fmt):
+    """Run the invoked subcommand on many hosts instead of one, then exit."""
+    from arkosctl.fleet import load_inventory, select_hosts, run_on_hosts
+    args = ctx.meta["arkosctl.args"]
+    if args[:1] in (["agent"], ["shell"]):
+        raise CLIException("'{0}' cannot be run on several hosts".format(
+            args[0]))
+    inventory = load_inventory()
+    names = select_hosts(inventory, spec)
+    params = ctx.params
+    env = dict(os.environ, ARKOS_CLI_HOSTS="", ARKOS_CLI_NO_RC="1",
+               ARKOS_CLI_NO_AGENT="1",
+               ARKOS_CLI_TIMEOUT=str(params["timeout"]),
+               ARKOS_CLI_POLL_MIN=str(params["poll_min"]),
+               ARKOS_CLI_POLL_MAX=str(params["poll_max"]),
+               ARKOS_CLI_OUTPUT=params["output"])
+    if params["no_cache"]:
+        env["ARKOS_CLI_NO_CACHE"] = "1"
+    if params["v"]:
+        env["ARKOS_CLI_VERBOSE"] = "1"
+    results = run_on_hosts(names, inventory, args, env, limit, fmt)
+    failed = [x["host"] for x in results if x["exit_code"]]
+    if failed:
+        raise CLIException("{0} of {1} hosts failed: {2}".format(
+            len(failed), len(results), ", ".join(failed)))
+    ctx.exit(0)
+
+
+def run():
+    """Console entry point; hands off to a running agent when possible."""
+    args = sys.argv[1:]
+    if not sys.stdin.isatty() and not os.environ.get("ARKOS_CLI_NO_AGENT"):
+        from arkosctl.agent import forward, forwardable
+        code = forward(args) if forwardable(args) else None
+        if code is not None:
+            sys.exit(code)
+    main()
 
 
 if __name__ == "__main__":
-    register_frameworks()
-    main()
-else:
-    register_frameworks()
+    run()
@@ -0,0 +1,4 @@
+"""Allow running arkosctl as `python -m arkosctl`."""
+from arkosctl import run
+
+run()
@@ -0,0 +1,192 @@
+"""Local agent serving arkosctl commands over a Unix socket.
+
+The agent keeps warm, authenticated clients in its process, so a command
+forwarded to it skips interpreter startup, framework imports and login.
+Only the read-only commands in `AGENT_COMMANDS` are forwarded; any other
+command runs in the calling process as usual.
+"""
+import base64
+import io
+import json
+import os
+import socket
+import sys
+
+try:
+    # Python 2
+    import SocketServer as socketserver
+except ImportError:
+    # Python 3
+    import socketserver
+
+from arkosctl.utils import cache_path
+
+
+ENV_PREFIX = "ARKOS_CLI_"
+
+# Commands run by the agent: read-only ones that neither prompt nor read
+# stdin or local files, and whose output is short enough to be sent back
+# in one piece once they have finished.
+AGENT_COMMANDS = set([
+    ("app", "available"), ("app", "info"), ("app", "installed"),
+    ("app", "list"), ("backup", "list"), ("backup", "types"),
+    ("cert", "assigns"), ("cert", "authorities"), ("cert", "info"),
+    ("cert", "list"), ("db", "list"), ("db", "types"), ("dbuser", "list"),
+    ("domain", "list"), ("fs", "list"), ("group", "list"), ("keys", "list"),
+    ("link", "list"), ("net", "ifaces"), ("net", "list"), ("sec", "list"),
+    ("sites", "list"), ("svc", "list"), ("svc", "status"), ("sys", "stats"),
+    ("sys", "version"), ("user", "list")
+])
+
+
+def socket_path():
+    """Return the path of the agent socket."""
+    return os.environ.get("ARKOS_CLI_AGENT") or cache_path("agent.sock")
+
+
+def forwardable(args):
+    """Whether a command line can be run by the agent."""
+    from arkosctl import main
+    try:
+        ctx = main.make_context(
+            "arkosctl", list(args), resilient_parsing=True)
+    except Exception:
+        return False
+    args = ctx.protected_args + ctx.args
+    if ctx.params.get("hosts") or ctx.params.get("output") == "ndjson" or \
+            "--help" in args:
+        return False
+    return tuple(args[:2]) in AGENT_COMMANDS
+
+
+def forward(args, path=None):
+    """Run a command line in a running agent.
+
+    Returns the command's exit code, or None if no agent is listening.
+    """
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    request = {
+        "args": args,
+        "env": {k: v for k, v in os.environ.items()
+                if k.startswith(ENV_PREFIX)},
+        "color": sys.stdout.isatty(),
+        "cwd": os.getcwd()
+    }
+    try:
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        resp = sock.makefile("rb").readline().decode("utf-8")
+    finally:
+        sock.close()
+    if not resp:
+        sys.stderr.write("Error: The arkosctl agent did not respond.\n")
+        return 1
+    resp = json.loads(resp)
+    for name in ["stdout", "stderr"]:
+        stream = getattr(sys, name)
+        stream.flush()
+        data = base64.b64decode(resp[name])
+        getattr(stream, "buffer", stream).write(data)
+        stream.flush()
+    return resp["exit_code"]
+
+
+def run_command(args, env=None, color=None, cwd=None):
+    """Run a command line in-process, capturing its output.
+
+    The command runs in the directory `cwd`, if given, so that relative
+    paths resolve as they would for the caller. If `env` is given, it
+    replaces all `ARKOS_CLI_*` variables for the command, so that none of
+    the agent's own or an earlier caller's settings apply.
+
+    Returns a tuple of (exit code, stdout bytes, stderr bytes).
+    """
+    from arkosctl import main
+    out, err = io.BytesIO(), io.BytesIO()
+    old_env = {k: v for k, v in os.environ.items()
+               if k.startswith(ENV_PREFIX)}
+    old_streams = sys.stdout, sys.stderr
+    old_cwd = os.getcwd()
+    # Python 2 writes byte strings to sys.stdout; Python 3 needs text.
+    text = sys.version_info[0] >= 3
+    streams = [io.TextIOWrapper(x) if text else x for x in (out, err)]
+    sys.stdout, sys.stderr = streams
+    if env is not None:
+        _set_cli_env(env)
+    try:
+        if cwd:
+            os.chdir(cwd)
+        main.main(args=args, prog_name="arkosctl", color=color)
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (1 if e.code else 0)
+    except Exception as e:
+        sys.stderr.write("Error: {0}\n".format(e))
+        code = 1
+    finally:
+        os.chdir(old_cwd)
+        sys.stdout, sys.stderr = old_streams
+        if text:
+            for x in streams:
+                x.detach()
+        _set_cli_env(old_env)
+    return code, out.getvalue(), err.getvalue()
+
+
+def _set_cli_env(env):
+    """Replace all `ARKOS_CLI_*` environment variables with `env`."""
+    for k in [x for x in os.environ if x.startswith(ENV_PREFIX)]:
+        del os.environ[k]
+    os.environ.update(
+        (k, v) for k, v in env.items() if k.startswith(ENV_PREFIX))
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    """Handle one forwarded command line per connection."""
+
+    def handle(self):
+        """Run the requested command and send back its result."""
+        line = self.rfile.readline()
+        if not line:
+            return
+        req = json.loads(line.decode("utf-8"))
+        if not forwardable(req["args"]):
+            code, out, err = 2, b"", b"Cannot be run through the agent.\n"
+        else:
+            code, out, err = run_command(
+                req["args"], req.get("env"), req.get("color"),
+                req.get("cwd"))
+        resp = {
+            "exit_code": code,
+            "stdout": base64.b64encode(out).decode("ascii"),
+            "stderr": base64.b64encode(err).decode("ascii")
+        }
+        self.wfile.write(json.dumps(resp).encode("utf-8") + b"\n")
+
+
+class AgentServer(socketserver.UnixStreamServer):
+    """Serve forwarded commands one at a time."""
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(path)
+            except socket.error:
+                os.unlink(path)
+            else:
+                raise Exception("An agent is already listening on " + path)
+            finally:
+                sock.close()
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, AgentHandler)
+        finally:
+            os.umask(umask)
@@ -0,0 +1,163 @@
+"""arkOS API client, extended for use by arkosctl."""
+import pyarkosclient
+import requests
+import threading
+
+from pyarkosclient.errors import AuthenticationError, GeneralError
+
+# Message of the error raised when a request gets no response at all.
+UNREACHABLE = "The server could not be reached."
+
+
+class Client(pyarkosclient.arkOS):
+    """API client that reuses connections and sessions.
+
+    All requests go through one `requests.Session`, so the HTTP connection
+    is kept alive for as long as the client is. When logging in with a
+    username and password, a token from the session cache is used instead
+    of a new login. If the server rejects a token, whether cached or not
+    (e.g. once it expires in a long-running shell or agent), the client
+    logs in again and retries the request once, sending a streamed body
+    again from its start; parallel requests that are rejected together
+    share a single new login. Read-only listings are served from the
+    response cache, if given, and invalidated by any change to the same
+    resource.
+    """
+
+    def __init__(self, host, username="", password="", api_key="",
+                 sessions=None, responses=None):
+        self.session = requests.Session()
+        self.login_lock = threading.Lock()
+        self.sessions = sessions
+        self.responses = responses
+        self.username = username
+        self.password = password
+        self.host = host
+        self.api_key = None
+        self.token = None
+        if api_key:
+            self.api_key = api_key
+            self._get("/ping")
+        elif not (username and password):
+            raise GeneralError("Username/password or API key required")
+        else:
+            self.token = sessions.get(host, username) if sessions else None
+            if not self.token:
+                self.login()
+        self._register_frameworks()
+
+    def login(self):
+        """Obtain a new token from the server and cache it."""
+        try:
+            r = self.session.post(
+                self.host + "/api/token",
+                json={"username": self.username, "password": self.password})
+        except requests.exceptions.ConnectionError:
+            raise GeneralError(UNREACHABLE)
+        self._process_http_status(r)
+        self.token = r.json().get("token")
+        if self.sessions:
+            self.sessions.set(self.host, self.username, self.token)
+
+    def _reauthenticate(self, func, *args, **kwargs):
+        token = self.token
+        body = kwargs.get("data")
+        try:
+            return func(self, *args, **kwargs)
+        except AuthenticationError as e:
+            if self.api_key:
+                raise
+            with self.login_lock:
+                # Another thread may have logged in again in the meantime.
+                if self.token == token:
+                    if self.sessions:
+                        self.sessions.drop(self.host, self.username)
+                    self.login()
+            if hasattr(body, "read"):
+                # A streamed body has been read already; send it again
+                # from the start, or not at all.
+                if not hasattr(body, "rewind"):
+                    raise e
+                body.rewind()
+            return func(self, *args, **kwargs)
+
+    def _request(self, method, endpoint, headers=None, raw=False,
+                 no_api=False, stream=False, **kwargs):
+        headers = dict(headers or {})
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        else:
+            headers["Authorization"] = "Bearer " + self.token
+        url = self.host + ("/api" if not no_api else "") + endpoint
+        if method != "GET" and self.responses and not no_api:
+            self.responses.invalidate(self.host, endpoint)
+        try:
+            r = self.session.request(
+                method, url, headers=headers, stream=stream, **kwargs)
+        except requests.exceptions.ConnectionError:
+            raise GeneralError(UNREACHABLE)
+        self._process_http_status(r)
+        if stream:
+            return r
+        if r.status_code == 202 and r.headers.get("Location") and \
+                method != "GET":
+            job = pyarkosclient.Job(
+                self.host, r.headers.get("Location").split("/")[-1])
+            job.endpoint = endpoint
+            if method == "DELETE":
+                return job
+            try:
+                return (job, r.json())
+            except ValueError:
+                return (job, {})
+        if method == "DELETE":
+            return r
+        return r.json() if not raw else r.content
+
+    def _get(self, endpoint, params=None, raw=False, no_api=False,
+             headers=None):
+        cache = self.responses if not (raw or no_api) else None
+        data = cache.get(self.host, endpoint, params) if cache else None
+        if data is None:
+            data = self._reauthenticate(
+                Client._request, "GET", endpoint, headers=headers, raw=raw,
+                no_api=no_api, params=params)
+            if cache:
+                cache.set(self.host, endpoint, params, data)
+        return data
+
+    def _post(self, endpoint, json=None, data=None, files=None, raw=False,
+              headers=None):
+        if data or files:
+            kwargs = {"data": data, "files": files}
+        else:
+            kwargs = {"json": json} if json else {}
+        return self._reauthenticate(
+            Client._request, "POST", endpoint, headers=headers, raw=raw,
+            **kwargs)
+
+    def _put(self, endpoint, json=None, raw=False, headers=None):
+        return self._reauthenticate(
+            Client._request, "PUT", endpoint, headers=headers, raw=raw,
+            json=json)
+
+    def _patch(self, endpoint, json=None, raw=False, headers=None):
+        return self._reauthenticate(
+            Client._request, "PATCH", endpoint, headers=headers, raw=raw,
+            json=json)
+
+    def _stream(self, method, endpoint, headers=None, no_api=False,
+                **kwargs):
+        """Send a request and return the response with its body unread.
+
+        Responses with a status that is not an error as far as
+        `_process_http_status()` is concerned (e.g. 206) are returned as
+        they are; the caller must close them.
+        """
+        return self._reauthenticate(
+            Client._request, method, endpoint, headers=headers,
+            no_api=no_api, stream=True, **kwargs)
+
+    def _delete(self, endpoint, headers=None):
+        return self._reauthenticate(
+            Client._request, "DELETE", endpoint, headers=headers)
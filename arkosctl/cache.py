@@ -0,0 +1,189 @@
+"""Local cache of responses from read-only API endpoints."""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from arkosctl.utils import cache_path
+
+
+# Cached endpoints, grouped by the framework that owns them, with the
+# number of seconds their responses stay fresh. Any request that changes
+# one of a group's endpoints invalidates the whole group.
+RESOURCES = {
+    "applications": (300, ["/apps"]),
+    "backups": (60, ["/backups"]),
+    "certificates": (60, ["/certificates", "/authorities", "/assignments"]),
+    "databases": (60, ["/databases", "/database_users", "/database_types"]),
+    "security": (60, ["/system/policies"]),
+    "websites": (60, ["/websites"])
+}
+
+
+def _digest(*parts):
+    return hashlib.sha1(
+        json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache(object):
+    """Cache JSON responses on disk per host and endpoint.
+
+    Entries expire after their resource's TTL, and the least recently used
+    entries are evicted once more than `size` are stored. While disabled,
+    cached entries are not read, but fresh responses are still stored.
+    Failing to store a response is never an error, so that processes and
+    threads sharing the cache cannot break each other's commands.
+    """
+
+    def __init__(self, path=None, size=256, enabled=True):
+        self._path = path
+        self.size = size
+        self.enabled = enabled
+
+    @property
+    def path(self):
+        """Directory holding the cache entries."""
+        if not self._path:
+            self._path = cache_path("responses")
+            if not os.path.isdir(self._path):
+                os.makedirs(self._path, 0o700)
+        return self._path
+
+    def resource(self, endpoint):
+        """Return the resource group an endpoint belongs to, if cached."""
+        for name, (ttl, prefixes) in RESOURCES.items():
+            for x in prefixes:
+                if endpoint == x or endpoint.startswith(x + "/"):
+                    return name
+        return None
+
+    def _file(self, host, resource, key):
+        return os.path.join(self.path, "{0}-{1}-{2}.json".format(
+            _digest(host)[:12], resource, key))
+
+    def get(self, host, endpoint, params=None):
+        """Return a fresh cached response, or None."""
+        resource = self.resource(endpoint)
+        if not self.enabled or not resource:
+            return None
+        path = self._file(host, resource, _digest(endpoint, params))
+        try:
+            if os.path.getmtime(path) + RESOURCES[resource][0] < time.time():
+                os.unlink(path)
+                return None
+            with open(path, "r") as f:
+                data = json.load(f)
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+            return data
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, host, endpoint, params, data):
+        """Store a response, evicting the least recently used entries."""
+        resource = self.resource(endpoint)
+        if not resource:
+            return
+        try:
+            path = self._file(host, resource, _digest(endpoint, params))
+            fd, tmp = tempfile.mkstemp(
+                prefix=os.path.basename(path) + ".", dir=self.path)
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.rename(tmp, path)
+        except (IOError, OSError, TypeError, ValueError):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for x in glob.glob(os.path.join(self.path, "*.json")):
+            try:
+                entries.append((os.stat(x).st_atime, x))
+            except OSError:
+                pass
+        if len(entries) > self.size:
+            for _, x in sorted(entries)[:len(entries) - self.size]:
+                try:
+                    os.unlink(x)
+                except OSError:
+                    pass
+
+    def invalidate(self, host, endpoint=None):
+        """Drop all entries of the resource group an endpoint belongs to.
+
+        Without an endpoint, all entries for the host are dropped.
+        """
+        resource = self.resource(endpoint) if endpoint else "*"
+        if not resource:
+            return
+        pattern = "{0}-{1}-*.json".format(_digest(host)[:12], resource)
+        for x in glob.glob(os.path.join(self.path, pattern)):
+            try:
+                os.unlink(x)
+            except OSError:
+                pass
+
+
+# Serializes the read-modify-write of the name index between threads.
+_names_lock = threading.Lock()
+
+
+class NameIndex(object):
+    """Map names of users and groups on a host to their IDs."""
+
+    def __init__(self, host, path=None):
+        self.host = host
+        self.path = path or cache_path("names.json")
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save(self, data):
+        try:
+            fd, tmp = tempfile.mkstemp(
+                prefix=os.path.basename(self.path) + ".",
+                dir=os.path.dirname(self.path))
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.rename(tmp, self.path)
+        except (IOError, OSError, TypeError, ValueError):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def get(self, kind, name):
+        """Return the indexed ID for a name, or None."""
+        return self._load().get(self.host, {}).get(kind, {}).get(name)
+
+    def update(self, kind, names):
+        """Add or replace a mapping of names to IDs."""
+        with _names_lock:
+            data = self._load()
+            data.setdefault(self.host, {}).setdefault(kind, {}).update(names)
+            self._save(data)
+
+    def drop(self, kind, name):
+        """Remove a name from the index."""
+        with _names_lock:
+            data = self._load()
+            names = data.get(self.host, {}).get(kind, {})
+            if names.pop(name, None) is not None:
+                self._save(data)
@@ -0,0 +1,69 @@
+"""Deferred connections to arkOS servers."""
+import threading
+
+_clients = {}
+
+
+def get_client(host, user="", password="", apikey=""):
+    """Return the client for these credentials, shared within the process."""
+    key = (host, user, password, apikey)
+    if key not in _clients:
+        _clients[key] = LazyClient(host, user, password, apikey)
+    return _clients[key]
+
+
+class LazyClient(object):
+    """Proxy for a `pyarkosclient.arkOS` client, connected on first use.
+
+    Nothing is imported or sent over the network until an attribute of the
+    client (e.g. `client().services`) is actually requested, so invocations
+    that fail argument validation or never reach the server stay offline.
+    """
+
+    def __init__(self, host, user="", password="", apikey=""):
+        from arkosctl.cache import ResponseCache
+        self.host = host
+        self.user = user
+        self.password = password
+        self.apikey = apikey
+        self.responses = ResponseCache()
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        """Whether a connection to the server has been made."""
+        return self._client is not None
+
+    def connect(self):
+        """Connect and authenticate to the server, if not already done."""
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                self._connect()
+        return self._client
+
+    def _connect(self):
+        from arkosctl import CLIException
+        if not self.host or not \
+                ((self.user and self.password) or self.apikey):
+            raise CLIException(
+                "No connection information specified for remote host.")
+        from arkosctl.api import Client
+        from arkosctl.sessions import SessionCache
+        try:
+            self._client = Client(
+                self.host, self.user, self.password, api_key=self.apikey,
+                sessions=SessionCache(), responses=self.responses)
+        except Exception as e:
+            raise CLIException(str(e))
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.connect(), name)
+
+    def __repr__(self):
+        return "<LazyClient {0}{1}>".format(
+            self.host, "" if self.connected else " (not connected)")
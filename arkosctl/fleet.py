@@ -0,0 +1,118 @@
+"""Running one command line against many arkOS hosts."""
+import click
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    # Python 2
+    import ConfigParser as configparser
+except ImportError:
+    # Python 3
+    import configparser
+
+from arkosctl import CLIException
+from arkosctl.utils import run_parallel
+
+
+def inventory_path():
+    """Return the path of the hosts inventory file."""
+    return os.environ.get("ARKOS_CLI_INVENTORY") or \
+        os.path.join(os.path.expanduser("~"), ".arkoshosts")
+
+
+def load_inventory(path=None):
+    """Read the hosts inventory.
+
+    Each section names a host and holds its `host` address, credentials
+    (`user` and `password`, or `apikey`) and a comma-separated list of
+    the `groups` it belongs to.
+    """
+    path = path or inventory_path()
+    if not os.path.exists(path):
+        raise CLIException("No hosts inventory found at {0}".format(path))
+    cfg = configparser.RawConfigParser()
+    cfg.read(path)
+    hosts = {}
+    for name in cfg.sections():
+        entry = dict(cfg.items(name))
+        if not entry.get("host"):
+            raise CLIException(
+                "Host '{0}' in {1} has no address".format(name, path))
+        entry["groups"] = [x.strip() for x in
+                           entry.get("groups", "").split(",") if x.strip()]
+        hosts[name] = entry
+    return hosts
+
+
+def select_hosts(hosts, spec):
+    """Return the sorted host names matched by a comma-separated spec.
+
+    Each item may be a group, a host name or `all`.
+    """
+    selected = set()
+    for item in [x.strip() for x in spec.split(",") if x.strip()]:
+        matched = [n for n, h in hosts.items()
+                   if item in ("all", n) or item in h["groups"]]
+        if not matched:
+            raise CLIException("No hosts in group '{0}'".format(item))
+        selected.update(matched)
+    return sorted(selected)
+
+
+def _run_host(name, entry, args, env):
+    env = dict(env)
+    env.update({
+        "ARKOS_CLI_HOST": entry["host"],
+        "ARKOS_CLI_USER": entry.get("user", ""),
+        "ARKOS_CLI_PASS": entry.get("password", ""),
+        "ARKOS_CLI_APIKEY": entry.get("apikey", "")
+    })
+    start = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "arkosctl"] + list(args), env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate(b"")
+    return {
+        "host": name, "exit_code": proc.returncode,
+        "stdout": out.decode("utf-8", "replace"),
+        "stderr": err.decode("utf-8", "replace"),
+        "seconds": round(time.time() - start, 3)
+    }
+
+
+def _show_prefixed(result, width):
+    prefix = click.style("{0: <{1}} | ".format(result["host"], width),
+                         fg="red" if result["exit_code"] else "cyan")
+    for line in result["stdout"].splitlines():
+        click.echo(prefix + line)
+    for line in result["stderr"].splitlines():
+        click.echo(prefix + line, err=True)
+
+
+def run_on_hosts(names, hosts, args, env, limit=8, fmt="prefix"):
+    """Run an arkosctl command line on each named host at the same time.
+
+    Every host gets its own arkosctl process, started from a pool of at
+    most `limit` threads, with its address and credentials passed in the
+    environment. In `prefix` format, each host's output is printed as soon
+    as it has finished, every line prefixed with the host name; in `json`
+    format a single list of results is printed at the end.
+
+    Returns the results in the order of `names`.
+    """
+    width = max(len(x) for x in names)
+    results = {}
+    for name, result, e in run_parallel(
+            lambda x: _run_host(x, hosts[x], args, env), names, limit):
+        if e:
+            raise e
+        results[name] = result
+        if fmt == "prefix":
+            _show_prefixed(result, width)
+    results = [results[x] for x in names]
+    if fmt == "json":
+        click.echo(json.dumps(results, indent=2, sort_keys=True))
+    return results
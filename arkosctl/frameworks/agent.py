@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Relates to the local arkosctl agent."""
+import click
+import os
+import signal
+import sys
+
+from arkosctl import client, CLIException, logger
+from arkosctl.agent import AgentServer, socket_path
+
+
+@click.command()
+@click.option("--socket", "path", default=None,
+              help="Path of the Unix socket to listen on")
+def agent(path):
+    """Serve commands over a local socket."""
+    path = path or socket_path()
+    if client().host:
+        client().connect()
+    try:
+        server = AgentServer(path)
+    except Exception as e:
+        raise CLIException(str(e))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.info('ctl:agent', 'Listening on {0}'.format(path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
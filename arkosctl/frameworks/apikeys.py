@@ -4,6 +4,7 @@ import click
 import os
 
 from arkosctl import client, logger, CLIException
+from arkosctl.output import emit, NAME_STYLE, table
 
 
 try:
@@ -25,20 +26,16 @@ def list_keys():
     """List all API keys."""
     try:
         keys = client().apikeys.get()
+        if emit(keys):
+            return
         if not keys:
             logger.info('ctl:keys:list', 'No keys found')
             return
-        llen = len(sorted(keys, key=lambda x: len(x["user"]))[-1].name)
-        for x in keys:
-            click.echo(
-                click.style(
-                    '{name: <45}'.format(name=x["key"]),
-                    fg="white", bold=True) +
-                click.style(
-                    '{name: <{fill}}'.format(name=x["user"], fill=llen + 3),
-                    fg="green") + "   " +
-                click.style(x["comment"], fg="yellow")
-            )
+        table([
+            [(x["key"], NAME_STYLE),
+             (x["user"], "green"), (x["comment"], "yellow")]
+            for x in keys
+        ])
     except Exception as e:
         raise CLIException(str(e))
 
@@ -3,7 +3,10 @@
 import click
 
 from arkosctl import client, CLIException, logger
-from arkosctl.utils import abort_if_false, handle_job
+from arkosctl.output import emit, NAME_STYLE, table
+from arkosctl.utils import (
+    abort_if_false, handle_jobs, JobManager, no_wait_option
+)
 
 
 @click.group(name='app')
@@ -13,21 +16,16 @@ def applications():
 
 
 def _list_applications(apps):
+    if emit(apps):
+        return
     if not apps:
         logger.info('ctl:app:list', 'No apps found')
         return
-    nlen = len(sorted(apps, key=lambda x: len(x["name"]))[-1]["name"])
-    vlen = len(sorted(apps, key=lambda x: len(x["version"]))[-1]["version"])
-    for x in sorted(apps, key=lambda x: x["name"]):
-        click.echo(
-            click.style(
-                '{name: <{fill}}'.format(name=x["name"], fill=nlen + 3),
-                fg="white", bold=True) +
-            click.style(
-                '{name: <{fill}}'.format(name=x["version"], fill=vlen + 3),
-                fg="green") + "   " +
-            x["description"]["short"]
-        )
+    table([
+        [(x["name"], NAME_STYLE),
+         (x["version"], "green"), x["description"]["short"]]
+        for x in sorted(apps, key=lambda x: x["name"])
+    ])
 
 
 @applications.command(name='list')
@@ -103,24 +101,30 @@ def info(id):
 
 
 @applications.command()
-@click.argument("id")
-def install(id):
-    """Install an application."""
+@click.argument("ids", metavar="ID...", nargs=-1, required=True)
+@no_wait_option
+def install(ids):
+    """Install one or more applications."""
     try:
-        job, data = client().applications.install(id=id)
-        handle_job(job)
+        jobs = JobManager()
+        for x in ids:
+            jobs.launch(x, client().applications.install, id=x)
+        handle_jobs(jobs)
     except Exception as e:
         raise CLIException(str(e))
 
 
 @applications.command()
-@click.argument("id")
+@click.argument("ids", metavar="ID...", nargs=-1, required=True)
 @click.option("--yes", callback=abort_if_false, expose_value=False,
               is_flag=True, prompt='Are you sure you want to remove this app?')
-def uninstall(id):
-    """Uninstall an application."""
+@no_wait_option
+def uninstall(ids):
+    """Uninstall one or more applications."""
     try:
-        job, data = client().applications.uninstall(id=id)
-        handle_job(job)
+        jobs = JobManager()
+        for x in ids:
+            jobs.launch(x, client().applications.uninstall, id=x)
+        handle_jobs(jobs)
     except Exception as e:
         raise CLIException(str(e))
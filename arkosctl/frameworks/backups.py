@@ -1,9 +1,20 @@
 # -*- coding: utf-8 -*-
 """Relates to commands for management of backups."""
 import click
+import json
+import os
+import re
 
-from arkosctl import client, CLIException, logger
-from arkosctl.utils import handle_job
+from arkosctl import client, CLIException, logger, transfers
+from arkosctl.output import emit
+from arkosctl.utils import handle_job, handle_jobs, JobManager, no_wait_option
+from arkosctl.utils import str_fsize
+
+# Folder on the server that holds a folder of backups for each app/site.
+BACKUP_DIR = "/var/lib/arkos/backups"
+
+# Name of a backup archive: the app/site ID, then the time it was taken.
+_ARCHIVE_NAME = re.compile(r"(.+)-\d{8}-\d{6}\.tar")
 
 
 @click.group(name='backup')
@@ -13,6 +24,8 @@ def backups():
 
 
 def _list_backups(bkps):
+    if emit(bkps):
+        return
     if not bkps:
         logger.info('ctl:bak:list', 'No backups found')
     for x in sorted(bkps, key=lambda x: x["time"]):
@@ -38,6 +51,8 @@ def backup_types():
     """List types of apps/sites that can create backups."""
     try:
         data = client().backups.get_types()
+        if emit(data):
+            return
         for x in data:
             imsg = click.style("(" + x["type"].capitalize() + ")", fg="yellow")
             click.echo(
@@ -48,20 +63,26 @@ def backup_types():
 
 
 @backups.command()
-@click.argument("appid")
-def create(appid):
-    """Create a backup."""
+@click.argument("appids", metavar="APPID...", nargs=-1, required=True)
+@no_wait_option
+def create(appids):
+    """Create a backup of one or more apps/sites."""
     try:
-        job, data = client().backups.create(id=appid)
-        handle_job(job)
+        jobs = JobManager()
+        for x in appids:
+            jobs.launch(x, client().backups.create, id=x)
+        handle_jobs(jobs)
     except Exception as e:
         raise CLIException(str(e))
     else:
-        click.secho("Backup saved!", fg="yellow")
+        click.secho(
+            "Backup saved!" if len(appids) == 1 else "Backups saved!",
+            fg="yellow")
 
 
 @backups.command()
 @click.argument("id")
+@no_wait_option
 def restore(id):
     """Restore a backup by ID."""
     if "/" not in id:
@@ -86,3 +107,113 @@ def delete(id):
         client().backups.delete(id=id, time=tsp)
     except Exception as e:
         raise CLIException(str(e))
+
+
+def _meta_path(path):
+    """Return the path of the metadata file kept next to a backup archive."""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, name.split(".tar")[0] + ".meta")
+
+
+def _read_sha256(path):
+    """Return the digest in a `sha256sum`-style sidecar file, or None."""
+    if not os.path.exists(path + ".sha256"):
+        return None
+    with open(path + ".sha256", "r") as f:
+        fields = f.read().split()
+    return fields[0].lower() if fields else None
+
+
+def _backup_app(path):
+    """Return the ID of the app/site a backup archive belongs to.
+
+    It is read from the metadata file exported with the archive, if any,
+    or else from the archive's name, which ends with the time of the
+    backup (e.g. `my-site-20160130-120000.tar.gz`).
+    """
+    try:
+        with open(_meta_path(path), "r") as f:
+            app = json.load(f).get("pid")
+    except (IOError, OSError, ValueError, AttributeError):
+        app = None
+    match = _ARCHIVE_NAME.match(os.path.basename(path))
+    app = app or (match.group(1) if match else None)
+    if not app:
+        raise CLIException(
+            "Cannot tell which app/site {0} belongs to; give it with --app"
+            .format(os.path.basename(path)))
+    return app
+
+
+@backups.command(name='export')
+@click.argument("id")
+@click.argument("path", type=click.Path(writable=True))
+def export_backup(id, path):
+    """Download a backup archive to a local file.
+
+    Interrupted downloads are resumed when the command is run again. The
+    SHA-256 of the archive is written to PATH.sha256 for `backup import`.
+    """
+    if "/" not in id:
+        raise CLIException("Requires full backup ID with app ID and timestamp")
+    id, tsp = id.split("/")
+    try:
+        conn = client()
+        data = conn.backups.get(id=id, time=tsp)
+        if os.path.isdir(path):
+            path = os.path.join(path, os.path.basename(data["path"]))
+        size, digest = transfers.download(
+            conn, data["path"], path, label=os.path.basename(path))
+        with open(path + ".sha256", "w") as f:
+            f.write("{0}  {1}\n".format(digest, os.path.basename(path)))
+        try:
+            transfers.download(
+                conn, _meta_path(data["path"]), _meta_path(path))
+        except Exception:
+            logger.debug('ctl:bak:export', 'No metadata file for backup')
+        logger.success('ctl:bak:export', 'Saved {0} ({1})'.format(
+            path, str_fsize(size)))
+        logger.info('ctl:bak:export', 'SHA-256: {0}'.format(digest))
+    except Exception as e:
+        raise CLIException(str(e))
+
+
+@backups.command(name='import')
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--app", default=None,
+              help="App or site the backup belongs to "
+                   "(default: from its metadata or file name)")
+@click.option("--checksum", is_flag=True,
+              help="Read the archive back from the server to compare its "
+                   "SHA-256")
+def import_backup(path, app, checksum):
+    """Upload a backup archive exported from an arkOS server.
+
+    If PATH.sha256 exists, the archive is checked against it before being
+    sent.
+    """
+    from arkosctl.frameworks.files import _make_remote_folders
+    try:
+        name = os.path.basename(path)
+        app = app or _backup_app(path)
+        expected = _read_sha256(path)
+        digest = transfers.file_sha256(path).hexdigest()
+        if expected and expected != digest:
+            raise CLIException(
+                "{0} does not match its checksum in {0}.sha256".format(path))
+        conn = client()
+        remote_dir = "{0}/{1}".format(BACKUP_DIR, app)
+        _make_remote_folders(conn, BACKUP_DIR, [app + "/" + name])
+        with transfers.Progress(os.path.getsize(path), label=name) as p:
+            transfers.upload(conn, path, remote_dir, progress=p)
+        if os.path.exists(_meta_path(path)):
+            transfers.upload(conn, _meta_path(path), remote_dir)
+        conn.responses.invalidate(conn.host, "/backups")
+        if checksum and transfers.remote_sha256(
+                conn, remote_dir + "/" + name) != digest:
+            raise CLIException(
+                "The uploaded archive does not match {0}".format(path))
+        logger.success('ctl:bak:import', 'Imported {0} for {1}'.format(
+            name, app))
+    except Exception as e:
+        raise CLIException(str(e))
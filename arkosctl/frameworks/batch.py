@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Relates to running scripts of command lines in one process."""
+import click
+import shlex
+import time
+
+from arkosctl import CLIException
+from arkosctl.utils import invoke_line, run_parallel
+
+
+def _read_lines(f):
+    """Return `(number, args)` for each command line of a script."""
+    lines = []
+    for num, line in enumerate(f, 1):
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise CLIException("Line {0}: {1}".format(num, e))
+        if not args:
+            continue
+        if args[0] in ("agent", "batch", "shell"):
+            raise CLIException(
+                "Line {0}: '{1}' cannot be run in a batch".format(
+                    num, args[0]))
+        lines.append((num, args))
+    return lines
+
+
+def _run_line(ctx, args):
+    """Invoke a command line, returning `(status, seconds)`."""
+    start = time.time()
+    status = "ok"
+    try:
+        invoke_line(ctx, args)
+    except click.ClickException as e:
+        e.show()
+        status = "failed"
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        status = "failed"
+    except SystemExit as e:
+        status = "ok" if not e.code else "failed"
+    except Exception as e:
+        CLIException(str(e)).show()
+        status = "failed"
+    return status, time.time() - start
+
+
+def _summary(results, elapsed):
+    width = max(len(str(x[0])) for x in results)
+    for num, args, status, secs in results:
+        fg = {"ok": "green", "failed": "red"}.get(status, "yellow")
+        cmd = " ".join(args)
+        click.echo(
+            click.style("{0: >{1}}  ".format(num, width), bold=True) +
+            click.style("{0: <8}".format(status), fg=fg) +
+            "{0: >7.2f}s  ".format(secs) +
+            (cmd if len(cmd) <= 50 else cmd[:47] + "..."), err=True)
+    click.secho(
+        "{0} lines in {1:.2f}s".format(len(results), elapsed),
+        dim=True, err=True)
+
+
+@click.command()
+@click.argument("script", type=click.File("r"))
+@click.option("--parallel", type=click.IntRange(1, 64), default=1,
+              help="Run up to N lines at the same time")
+@click.option("--keep-going/--stop-on-error", default=False,
+              help="Carry on with the remaining lines after a failure")
+@click.option("--timing/--no-timing", default=True,
+              help="Show how long each line took at the end")
+@click.pass_context
+def batch(ctx, script, parallel, keep_going, timing):
+    """Run arkosctl command lines from a file ('-' for stdin).
+
+    Each line is a command line as it would follow `arkosctl`, e.g.
+    `svc restart nginx`; blank lines and `#` comments are skipped. All
+    lines share one connection and login. Commands cannot prompt, so
+    pass `--yes` and similar options where needed.
+
+    With --parallel, lines are assumed to be independent of each other
+    and their output may be interleaved.
+    """
+    lines = _read_lines(script)
+    results = []
+    start = time.time()
+    if parallel == 1:
+        for num, args in lines:
+            status, secs = _run_line(ctx, args)
+            results.append((num, args, status, secs))
+            if status != "ok" and not keep_going:
+                break
+    else:
+        for (num, args), result, _ in run_parallel(
+                lambda x: _run_line(ctx, x[1]), lines, parallel,
+                lambda: not keep_going and
+                any(x[2] != "ok" for x in results)):
+            status, secs = result
+            results.append((num, args, status, secs))
+        results.sort()
+    done = set(x[0] for x in results)
+    results += [(num, args, "skipped", 0.0)
+                for num, args in lines if num not in done]
+    if timing and results:
+        _summary(results, time.time() - start)
+    failures = len([x for x in results if x[2] == "failed"])
+    if failures:
+        raise CLIException("{0} of {1} lines failed".format(
+            failures, len(results)))
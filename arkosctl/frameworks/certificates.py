@@ -3,7 +3,8 @@
 import click
 
 from arkosctl import client, CLIException, logger
-from arkosctl.utils import abort_if_false, handle_job
+from arkosctl.output import emit, NAME_STYLE, table
+from arkosctl.utils import abort_if_false, handle_job, no_wait_option
 
 
 @click.group(name='cert')
@@ -17,20 +18,18 @@ def list_certs():
     """List all certificates."""
     try:
         certs = client().certificates.get()
+        if emit(certs):
+            return
         if not certs:
             logger.info('ctl:cert:list', 'No certificates found')
-        llen = len(sorted(certs, key=lambda x: len(x["id"]))[-1]["id"])
-        for x in sorted(certs, key=lambda x: x["id"]):
-            klkt = "{0}-bit {1}".format(x["keylength"], x["keytype"])
-            click.echo(
-                click.style(
-                    '{name: <{fill}}'.format(name=x["id"], fill=llen + 3),
-                    fg="white", bold=True) +
-                click.style(
-                    '{name: <15}'.format(name=klkt),
-                    fg="green") +
-                click.style(x["domain"], fg="yellow")
-            )
+            return
+        table([
+            [(x["id"], NAME_STYLE),
+             ("{0}-bit {1}".format(x["keylength"], x["keytype"]),
+              "green"),
+             (x["domain"], "yellow")]
+            for x in sorted(certs, key=lambda x: x["id"])
+        ])
     except Exception as e:
         raise CLIException(str(e))
 
@@ -71,19 +70,18 @@ def list_authorities():
     """List all certificate authorities (CAs)."""
     try:
         certs = client().certificates.get_authorities()
+        if emit(certs):
+            return
         if not certs:
             logger.info(
                 'ctl:cert:authorities', 'No certificate authorities found'
             )
             return
-        llen = len(sorted(certs, key=lambda x: len(x["id"]))[-1]["id"])
-        for x in sorted(certs, key=lambda x: x["id"]):
-            click.echo(
-                click.style(
-                    '{name: <{fill}}'.format(name=x["id"], fill=llen + 3),
-                    fg="white", bold=True) + "Expires " +
-                click.style(x["expiry"].strftime("%c"), fg="yellow")
-            )
+        table([
+            [(x["id"], NAME_STYLE),
+             ("Expires " + x["expiry"].strftime("%c"), "yellow")]
+            for x in sorted(certs, key=lambda x: x["id"])
+        ])
     except Exception as e:
         raise CLIException(str(e))
 
@@ -91,14 +89,19 @@ def list_authorities():
 @certificates.command()
 def assigns():
     """List all apps/sites that can use certificates."""
-    click.echo("Apps/Sites that can use certificates:")
     try:
         assigns = client().certificates.get_possible_assigns()
-        for x in assigns:
-            imsg = click.style("(" + x["type"].capitalize() + ")", fg="green")
-            click.echo(
-                click.style(x["name"], fg="white", bold=True) + " " + imsg
-            )
+        if emit(assigns):
+            return
+        if not assigns:
+            logger.info('ctl:cert:assigns', 'No apps or sites found')
+            return
+        click.echo("Apps/Sites that can use certificates:")
+        table([
+            [(x["name"], NAME_STYLE),
+             ("(" + x["type"].capitalize() + ")", "green")]
+            for x in assigns
+        ], gap=1)
     except Exception as e:
         raise CLIException(str(e))
 
@@ -115,6 +118,7 @@ def assigns():
               help="SSL key type (ex.: 'RSA' or 'DSA')")
 @click.option("--keylength", type=int, default=2048,
               help="SSL key length in bits")
+@no_wait_option
 def generate(name, domain, country, state, locale, email,
              keytype, keylength):
     """Generate an SSL/TLS certificate."""
@@ -168,6 +172,7 @@ def request(domain):
 @click.argument("keyfile", type=click.File("r"))
 @click.option("--chainfile", default=None, type=click.File("r"),
               help="Optional file to include in cert chain")
+@no_wait_option
 def upload(name, certfile, keyfile, chainfile):
     """Upload an SSL/TLS certificate."""
     try:
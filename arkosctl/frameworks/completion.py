@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Relates to shell completion of commands and resource IDs."""
+import click
+import os
+import re
+
+from arkosctl import client, CLIException, logger, main
+from arkosctl.utils import cache_path
+
+
+# Resource IDs offered for completion, with the function that lists them
+# and the commands that take them as arguments. Backups are listed raw, so
+# that their full IDs use the timestamps exactly as the server sent them.
+RESOURCES = {
+    "apps": (
+        lambda c: [x["id"] for x in c.applications.get()],
+        ["app info", "app install", "app uninstall", "backup create"]),
+    "backups": (
+        lambda c: ["{0}/{1}".format(x["pid"], x["time"])
+                   for x in c._get("/backups").get("backups") or []],
+        ["backup restore", "backup delete"]),
+    "certs": (
+        lambda c: [x["id"] for x in c.certificates.get()],
+        ["cert info", "cert assign", "cert unassign", "cert delete"]),
+    "databases": (
+        lambda c: [x["id"] for x in c.databases.get()],
+        ["db dump", "db drop"]),
+    "services": (
+        lambda c: [x["id"] for x in c.services.get()],
+        ["svc start", "svc stop", "svc restart", "svc enable",
+         "svc disable", "svc status"]),
+    "sites": (
+        lambda c: [x["id"] for x in c.websites.get()],
+        ["sites edit", "sites enable", "sites disable", "sites update",
+         "sites remove"]),
+    "users": (
+        lambda c: [x["name"] for x in c.roles.get_users()],
+        ["user mod", "user passwd", "user delete"])
+}
+
+# Minutes after which the shell asks for a background refresh of the index.
+MAX_AGE = 10
+
+BASH_SCRIPT = """\
+_arkosctl_subcommands() {
+    case "$1" in
+%(subcommands)s
+    esac
+}
+
+_arkosctl_resource() {
+    case "$1" in
+%(resources)s
+    esac
+}
+
+_arkosctl_host() {
+    local host="$1"
+    if [[ -z $host && -f ~/.arkosrc ]]; then
+        host="$(sed -n 's/^host *[=:] *//p' ~/.arkosrc | head -n 1)"
+    fi
+    echo "${host:-$ARKOS_CLI_HOST}"
+}
+
+_arkosctl_complete() {
+    local cur="${COMP_WORDS[COMP_CWORD]}" words=() skip=0 opt="" host=""
+    local i w res file
+    for ((i=1; i<COMP_CWORD; i++)); do
+        w="${COMP_WORDS[i]}"
+        if [[ $skip == 1 ]]; then
+            [[ $w == "=" ]] && continue
+            skip=0
+            [[ $opt == --host ]] && host="$w"
+            continue
+        fi
+        case "$w" in
+            %(value_options)s) skip=1; opt="$w" ;;
+            -*) ;;
+            *) words+=("$w") ;;
+        esac
+    done
+    case ${#words[@]} in
+        0) COMPREPLY=($(compgen -W "%(commands)s" -- "$cur")) ;;
+        1) COMPREPLY=($(compgen -W "$(_arkosctl_subcommands "${words[0]}")" \\
+               -- "$cur")) ;;
+        *)
+            res="$(_arkosctl_resource "${words[0]} ${words[1]}")"
+            host="$(_arkosctl_host "$host")"
+            [[ -z $res || -z $host ]] && return
+            file="%(index)s/${host//[^A-Za-z0-9.-]/_}/$res"
+            if [[ ! -f $file || -n $(find "$file" -mmin +%(max_age)d) ]]; then
+                (arkosctl --host "$host" completion refresh \\
+                    >/dev/null 2>&1 &)
+            fi
+            [[ -f $file ]] && \\
+                COMPREPLY=($(compgen -W "$(<"$file")" -- "$cur")) ;;
+    esac
+}
+
+complete -F _arkosctl_complete arkosctl
+"""
+
+ZSH_SCRIPT = """\
+autoload -U +X bashcompinit && bashcompinit
+%(bash)s"""
+
+FISH_SCRIPT = """\
+function __arkosctl_host
+    set -l args (commandline -opc)
+    set -l i (contains -i -- --host $args)
+    if test -n "$i"; and test (count $args) -gt $i
+        echo $args[(math $i + 1)]
+        return
+    end
+    set -l host
+    if test -f ~/.arkosrc
+        set host (sed -n 's/^host *[=:] *//p' ~/.arkosrc | head -n 1)
+    end
+    test -n "$host"; and echo $host; or echo $ARKOS_CLI_HOST
+end
+
+function __arkosctl_index
+    set -l host (__arkosctl_host)
+    test -n "$host"; or return
+    set -l key (string replace -ra '[^A-Za-z0-9.-]' _ -- $host)
+    set -l file "%(index)s/$key/$argv[1]"
+    if not test -f $file; or test -n "$(find $file -mmin +%(max_age)d)"
+        arkosctl --host $host completion refresh >/dev/null 2>&1 &
+        disown 2>/dev/null
+    end
+    test -f $file; and cat $file
+end
+
+complete -c arkosctl -f
+complete -c arkosctl -n __fish_use_subcommand -a "%(commands)s"
+%(lines)s
+"""
+
+
+def index_path(host):
+    """Return the folder holding the completion index for a host."""
+    return cache_path("complete", re.sub(r"[^A-Za-z0-9.-]", "_", host))
+
+
+def _value_options():
+    """Return the root options that take a value, to skip their values."""
+    return [x for param in main.params
+            if isinstance(param, click.Option) and not param.is_flag
+            for x in param.opts + param.secondary_opts]
+
+
+def _tree():
+    """Return the command names of each group in the command tree."""
+    tree = {}
+    for name in main.list_commands(None):
+        cmd = main.get_command(None, name)
+        if isinstance(cmd, click.MultiCommand):
+            tree[name] = cmd.list_commands(None)
+        else:
+            tree[name] = []
+    return tree
+
+
+def _resources():
+    return {cmd: name for name, (func, cmds) in RESOURCES.items()
+            for cmd in cmds}
+
+
+def _bash_script():
+    tree, index = _tree(), cache_path("complete")
+    subcommands = "\n".join(
+        '        {0}) echo "{1}" ;;'.format(k, " ".join(v))
+        for k, v in sorted(tree.items()) if v)
+    resources = "\n".join(
+        '        "{0}") echo {1} ;;'.format(k, v)
+        for k, v in sorted(_resources().items()))
+    return BASH_SCRIPT % {
+        "subcommands": subcommands, "resources": resources,
+        "commands": " ".join(sorted(tree)), "index": index,
+        "value_options": "|".join(_value_options()), "max_age": MAX_AGE
+    }
+
+
+def _fish_script():
+    tree, lines = _tree(), []
+    for group, cmds in sorted(tree.items()):
+        if cmds:
+            lines.append(
+                'complete -c arkosctl -n "__fish_seen_subcommand_from {0}; '
+                'and not __fish_seen_subcommand_from {1}" -a "{1}"'.format(
+                    group, " ".join(cmds)))
+    for cmd, res in sorted(_resources().items()):
+        group, sub = cmd.split()
+        lines.append(
+            'complete -c arkosctl -n "__fish_seen_subcommand_from {0}; '
+            'and __fish_seen_subcommand_from {1}" '
+            '-a "(__arkosctl_index {2})"'.format(group, sub, res))
+    return FISH_SCRIPT % {
+        "index": cache_path("complete"), "max_age": MAX_AGE,
+        "commands": " ".join(sorted(tree)), "lines": "\n".join(lines)
+    }
+
+
+@click.group(name='completion')
+def completion():
+    """Shell completion commands."""
+    pass
+
+
+@completion.command()
+@click.argument("shell", type=click.Choice(["bash", "zsh", "fish"]))
+def script(shell):
+    """Print the completion script for a shell."""
+    if shell == "bash":
+        click.echo(_bash_script(), nl=False)
+    elif shell == "zsh":
+        click.echo(ZSH_SCRIPT % {"bash": _bash_script()}, nl=False)
+    else:
+        click.echo(_fish_script(), nl=False)
+
+
+@completion.command()
+def refresh():
+    """Refresh the local index of resource IDs used for completion."""
+    index = index_path(client().host)
+    if not os.path.isdir(index):
+        os.makedirs(index, 0o700)
+    failed = []
+    for name, (func, cmds) in sorted(RESOURCES.items()):
+        try:
+            ids = func(client()) or []
+        except CLIException:
+            raise
+        except Exception:
+            failed.append(name)
+            continue
+        tmp = os.path.join(index, ".{0}.{1}".format(name, os.getpid()))
+        with open(tmp, "w") as f:
+            f.write("".join(str(x) + "\n" for x in sorted(ids)))
+        os.rename(tmp, os.path.join(index, name))
+    if failed:
+        logger.warning(
+            'ctl:completion:refresh',
+            'Could not refresh: {0}'.format(", ".join(failed)))
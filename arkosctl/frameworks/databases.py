@@ -1,8 +1,26 @@
 # -*- coding: utf-8 -*-
 """Relates to commands for management of databases."""
 import click
+import codecs
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
 
-from arkosctl import client, CLIException, logger
+from arkosctl import client, CLIException, logger, transfers
+from arkosctl.api import UNREACHABLE
+from arkosctl.output import emit, NAME_STYLE, table
+from arkosctl.utils import cache_path, run_parallel, str_fsize
+
+# Tokens that change how the rest of an SQL script is read: escapes,
+# comments, quotes, PostgreSQL dollar quotes and statement ends.
+_SQL_TOKENS = re.compile(r"\\.|--|/\*|\*/|\$\w*\$|['\"`;\n]", re.S)
+_SQL_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SQL_CONFORMING = re.compile(
+    r"SET\s+(?:SESSION\s+|LOCAL\s+)?standard_conforming_strings\s*"
+    r"(?:=|TO)\s*'?(on|off)\b", re.I)
 
 
 @click.group()
@@ -17,24 +35,27 @@ def db_users():
     pass
 
 
+def _type_names():
+    """Map database type IDs to their names with a single request."""
+    return {x["id"]: x["name"] for x in client().databases.get_types()}
+
+
 @db.command(name='list')
 def list_dbs():
     """List all databases."""
     try:
         dbs = client().databases.get()
+        if emit(dbs):
+            return
         if not dbs:
             logger.info('ctl:db:list', 'No databases found')
-        llen = len(sorted(dbs, key=lambda x: len(x["id"]))[-1]["id"])
-        for x in sorted(dbs, key=lambda x: x["id"]):
-            click.echo(
-                click.style(
-                    '{name: <{fill}}'.format(name=x["id"], fill=llen + 3),
-                    fg="white", bold=True) +
-                click.style(
-                    client().databases.get_types(
-                        id=x["database_type"])["name"],
-                    fg="yellow")
-            )
+            return
+        types = _type_names()
+        table([
+            [(x["id"], NAME_STYLE),
+             (types[x["database_type"]], "yellow")]
+            for x in sorted(dbs, key=lambda x: x["id"])
+        ])
     except Exception as e:
         raise CLIException(str(e))
 
@@ -44,20 +65,17 @@ def list_users():
     """List all database users."""
     try:
         dbs = client().databases.get_users()
+        if emit(dbs):
+            return
         if not dbs:
             logger.info('ctl:dbusr:list', 'No database users found')
             return
-        llen = len(sorted(dbs, key=lambda x: len(x["id"]))[-1]["id"])
-        for x in sorted(dbs, key=lambda x: x["id"]):
-            click.echo(
-                click.style(
-                    '{name: <{fill}}'.format(name=x["id"], fill=llen + 3),
-                    fg="white", bold=True) +
-                click.style(
-                    client().databases.get_types(
-                        id=x["database_type"])["name"],
-                    fg="yellow")
-            )
+        types = _type_names()
+        table([
+            [(x["id"], NAME_STYLE),
+             (types[x["database_type"]], "yellow")]
+            for x in sorted(dbs, key=lambda x: x["id"])
+        ])
     except Exception as e:
         raise CLIException(str(e))
 
@@ -67,19 +85,17 @@ def list_types():
     """List all database types and running status."""
     try:
         dbs = client().databases.get_types()
+        if emit(dbs):
+            return
         if not dbs:
             logger.info('ctl:db:types', 'No databases found')
             return
-        llen = len(sorted(dbs, key=lambda x: len(x["name"]))[-1]["name"])
-        for x in sorted(dbs, key=lambda x: x["id"]):
-            click.echo(
-                click.style(
-                    '{name: <{fill}}'.format(name=x["name"], fill=llen + 3),
-                    fg="white", bold=True) +
-                click.style(
-                    "Running" if x["state"] else "Stopped",
-                    fg="green" if x["state"] else "red")
-            )
+        table([
+            [(x["name"], NAME_STYLE),
+             ("Running" if x["state"] else "Stopped",
+              "green" if x["state"] else "red")]
+            for x in sorted(dbs, key=lambda x: x["id"])
+        ])
     except Exception as e:
         raise CLIException(str(e))
 
@@ -108,15 +124,232 @@ def add_user(name, type_id):
         raise CLIException(str(e))
 
 
+def _dump(conn, name, dest, compression, progress):
+    r = conn._stream(
+        "GET", "/databases/{0}".format(name), params={"download": True})
+    return transfers.save_stream(r, dest, compression, progress)
+
+
+@db.command()
+@click.argument("names", nargs=-1, required=True)
+@click.argument("path", type=click.Path(writable=True))
+@click.option("--compress", type=click.Choice(["none", "gzip", "zstd"]),
+              default=None,
+              help="Compress the dump (default: from the file name)")
+@click.option("--parallel", type=click.IntRange(1, 16), default=2,
+              help="Number of databases to dump at the same time")
+def dump(names, path, compress, parallel):
+    """Export databases to SQL files.
+
+    With several databases, or when PATH is a folder, each is saved in it
+    as NAME.sql (plus .gz or .zst when compressed). A PATH of - writes a
+    single database to standard output.
+    """
+    try:
+        if path == "-":
+            if len(names) > 1:
+                raise CLIException(
+                    "Only one database can be dumped to standard output")
+            dests = [path]
+        elif len(names) > 1 or os.path.isdir(path):
+            if not os.path.isdir(path):
+                raise CLIException("{0} is not a folder".format(path))
+            suffix = {"gzip": ".gz", "zstd": ".zst"}.get(compress, "")
+            dests = [os.path.join(path, x + ".sql" + suffix) for x in names]
+        else:
+            dests = [path]
+        conn = client()
+        conn.connect()
+        with transfers.Progress() as progress:
+            results = [
+                (name, dest, size, str(e) if e else None)
+                for (name, dest), size, e in run_parallel(
+                    lambda x: _dump(
+                        conn, x[0], x[1],
+                        compress or transfers.compression_for(x[1]),
+                        progress),
+                    list(zip(names, dests)), parallel)]
+        for name, dest, size, error in results:
+            if error:
+                logger.error('ctl:db:dump', '{0}: {1}'.format(name, error))
+            else:
+                logger.success(
+                    'ctl:db:dump', 'Database {0} dumped to {1} ({2})'.format(
+                        name, "standard output" if dest == "-" else dest,
+                        str_fsize(size)))
+        failed = len([x for x in results if x[3]])
+        if failed:
+            raise CLIException("{0} of {1} databases could not be dumped"
+                               .format(failed, len(results)))
+    except Exception as e:
+        raise CLIException(str(e))
+
+
+def _statements(chunks):
+    """Split SQL text into statements, read a chunk at a time.
+
+    Yields each statement with the offset in the text just after it.
+    Semicolons inside quotes, comments and dollar-quoted bodies do not
+    end a statement. Backslashes escape the next character in quoted
+    strings, as in MySQL, until the script sets
+    standard_conforming_strings on, as pg_dump does; from then on they
+    only do so in E'' strings.
+    """
+    buf, base, start, scan, state = "", 0, 0, 0, None
+    backslashes = True
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            rest = buf[start:]
+            if _SQL_COMMENTS.sub("", rest).strip():
+                yield rest.strip(), base + len(buf)
+            return
+        buf += chunk
+        while True:
+            for m in _SQL_TOKENS.finditer(buf, scan):
+                tok = m.group()
+                scan = m.end()
+                if tok[0] == "\\":
+                    if not (state == "E'" or
+                            backslashes and state in ("'", '"')):
+                        # A literal backslash: read on from the next
+                        # character, which may be a token itself.
+                        scan = m.start() + 1
+                        break
+                elif state is None:
+                    if tok == "'" and _e_string(buf, m.start()):
+                        state = "E'"
+                    elif tok in ("'", '"', "`") or tok.startswith("$"):
+                        state = tok
+                    elif tok in ("--", "/*"):
+                        state = tok
+                    elif tok == ";":
+                        stmt = buf[start:m.end()].strip()
+                        if _SQL_CONFORMING.search(stmt):
+                            backslashes = _backslashes(stmt, backslashes)
+                        yield stmt, base + m.end()
+                        start = m.end()
+                elif state == "--":
+                    if tok == "\n":
+                        state = None
+                elif state == "/*":
+                    if tok == "*/":
+                        state = None
+                elif tok == state or state == "E'" and tok == "'":
+                    state = None
+            else:
+                break
+        base += start
+        buf, scan, start = buf[start:], scan - start, 0
+
+
+def _e_string(buf, i):
+    """Return whether the quote at `buf[i]` opens a PostgreSQL E'' string."""
+    return buf[i - 1:i] in ("E", "e") and \
+        not (buf[i - 2:i - 1].isalnum() or buf[i - 2:i - 1] == "_")
+
+
+def _backslashes(stmt, current):
+    """Return whether backslashes escape in strings after a SET statement."""
+    m = _SQL_CONFORMING.match(_SQL_COMMENTS.sub("", stmt).strip())
+    return m.group(1).lower() == "off" if m else current
+
+
+def _decoded(f, size=1024 * 1024):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        data = f.read(size)
+        if not data:
+            yield decoder.decode(b"", True)
+            return
+        yield decoder.decode(data)
+
+
+def _execute(conn, name, sql, retries=3):
+    """Run SQL on a database, retrying while the server cannot be reached.
+
+    Errors sent back by the server (e.g. a syntax error) are not retried.
+    """
+    import requests
+    from pyarkosclient.errors import GeneralError
+    for attempt in range(retries + 1):
+        try:
+            return conn.databases.execute(name, sql)
+        except (GeneralError, requests.exceptions.ConnectionError) as e:
+            if isinstance(e, GeneralError) and e.error != UNREACHABLE or \
+                    attempt == retries:
+                raise
+            time.sleep(2 ** attempt)
+
+
 @db.command()
 @click.argument("name")
-@click.argument("path", type=click.File("wb"))
-def dump(name, path):
-    """Export database to SQL file."""
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--compress", type=click.Choice(["none", "gzip", "zstd"]),
+              default=None,
+              help="Compression of the file (default: from the file name)")
+@click.option("--chunk-size", type=click.IntRange(1, 65536), default=256,
+              help="Kilobytes of SQL to send per request")
+@click.option("--restart", is_flag=True,
+              help="Start from the beginning instead of resuming")
+def load(name, path, compress, chunk_size, restart):
+    """Import an SQL file into a database.
+
+    The file is read, decompressed and sent a few statements at a time,
+    so it may be of any size. If the import stops on an error or a lost
+    connection, running the same command again resumes it after the last
+    chunk the server accepted; that chunk may be run again, so fix the
+    error first. Dumps must consist of plain SQL statements (e.g. from
+    pg_dump --inserts; COPY blocks and MySQL DELIMITER are not supported).
+    """
     try:
-        data = client().databases.dump(name)
-        path.write(data)
-        logger.success('ctl:db:dump', 'Database dumped to {0}'.format(path))
+        conn = client()
+        stat = os.stat(path)
+        key = hashlib.sha1("{0}|{1}|{2}".format(
+            conn.host, name, os.path.abspath(path)).encode("utf-8"))
+        checkpoint = cache_path("load-{0}.json".format(key.hexdigest()[:12]))
+        done = 0
+        if os.path.exists(checkpoint) and not restart:
+            with open(checkpoint, "r") as f:
+                state = json.load(f)
+            if [state["size"], state["mtime"]] == [stat.st_size,
+                                                   stat.st_mtime]:
+                done = state["offset"]
+        if done:
+            logger.info('ctl:db:load', 'Resuming {0} after {1}'.format(
+                path, str_fsize(done)))
+        conn.connect()
+        limit = chunk_size * 1024
+        sent = 0
+        with open(path, "rb") as raw, \
+                transfers.Progress(stat.st_size) as progress:
+            f = transfers.compressed_reader(
+                raw, compress or transfers.compression_for(path))
+            batch, size, end, read = [], 0, 0, 0
+
+            def flush(batch, end):
+                _execute(conn, name, "\n".join(batch))
+                with open(checkpoint, "w") as c:
+                    json.dump({"size": stat.st_size, "mtime": stat.st_mtime,
+                               "offset": end}, c)
+
+            for stmt, end in _statements(_decoded(f)):
+                progress.update(raw.tell() - read)
+                read = raw.tell()
+                if end <= done:
+                    continue
+                batch.append(stmt)
+                size += len(stmt)
+                if size >= limit:
+                    flush(batch, end)
+                    batch, sent, size = [], sent + size, 0
+            if batch:
+                flush(batch, end)
+                sent += size
+            progress.update(raw.tell() - read)
+        if os.path.exists(checkpoint):
+            os.unlink(checkpoint)
+        logger.success('ctl:db:load', 'Loaded {0} of SQL into {1}'.format(
+            str_fsize(sent), name))
     except Exception as e:
         raise CLIException(str(e))
 
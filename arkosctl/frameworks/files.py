@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 """Relates to the management of files."""
 import click
+import os
+import time
 
-from arkosctl import client, CLIException, logger
+from arkosctl import client, CLIException, logger, transfers
+from arkosctl.output import emit
+from arkosctl.utils import run_parallel, str_fsize
 
 
 @click.group(name='link')
@@ -22,6 +26,8 @@ def list_shares():
     """List all fileshare links."""
     try:
         data = client().files.get_shares()
+        if emit(data):
+            return
         for x in data:
             smsg = click.style(x["path"], fg="white", bold=True)
             click.echo(smsg + " ({0})".format(x["id"]))
@@ -72,13 +78,62 @@ def remove_share(id):
 
 @files.command()
 @click.argument("path")
-@click.argument("out_path", type=click.File("wb"))
-def download(path, out_path):
-    """Download a file/folder from the server (remote connections only)."""
+@click.argument("out_path", type=click.Path(writable=True))
+@click.option("--sha256", default=None,
+              help="Expected SHA-256 checksum of the downloaded file")
+def download(path, out_path, sha256):
+    """Download a file/folder from the server (remote connections only).
+
+    Interrupted downloads are resumed when the command is run again.
+    """
+    try:
+        if os.path.isdir(out_path):
+            out_path = os.path.join(
+                out_path, os.path.basename(path.rstrip("/")))
+        size, digest = transfers.download(client(), path, out_path, sha256)
+        logger.success('ctl:files:download', 'Saved {0} ({1})'.format(
+            out_path, str_fsize(size)))
+        logger.info('ctl:files:download', 'SHA-256: {0}'.format(digest))
+    except Exception as e:
+        raise CLIException(str(e))
+
+
+@files.command()
+@click.argument("local_paths", nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+@click.argument("remote_dir")
+@click.option("--parallel", type=click.IntRange(1, 16), default=2,
+              help="Number of files to upload at the same time")
+@click.option("--retries", type=click.IntRange(0, 10), default=3,
+              help="Times to retry a failed upload")
+@click.option("--checksum", is_flag=True,
+              help="Read each file back to compare its SHA-256")
+def upload(local_paths, remote_dir, parallel, retries, checksum):
+    """Upload files to a folder on the server (remote connections only)."""
     try:
-        data = client().files.download(path)
-        with open(out_path, "w") as f:
-            f.write(data.encode("utf-8"))
+        conn = client()
+        conn.connect()
+        total = sum(os.path.getsize(x) for x in local_paths)
+
+        def send(path):
+            transfers.upload(conn, path, remote_dir, retries, progress)
+            remote = remote_dir.rstrip("/") + "/" + os.path.basename(path)
+            if checksum and transfers.remote_sha256(conn, remote) != \
+                    transfers.file_sha256(path).hexdigest():
+                raise CLIException("Checksum mismatch for {0}".format(path))
+            return path
+
+        with transfers.Progress(total) as progress:
+            errors = [(path, str(e)) for path, _, e in
+                      run_parallel(send, local_paths, parallel) if e]
+        for path, msg in errors:
+            logger.error('ctl:files:upload', '{0}: {1}'.format(path, msg))
+        if errors:
+            raise CLIException("{0} of {1} files could not be uploaded".format(
+                len(errors), len(local_paths)))
+        logger.success('ctl:files:upload', 'Uploaded {0} ({1})'.format(
+            ", ".join(os.path.basename(x) for x in local_paths),
+            str_fsize(total)))
     except Exception as e:
         raise CLIException(str(e))
 
@@ -97,3 +152,154 @@ def edit(path):
             logger.info('ctl:files:edit', 'File not saved')
     except Exception as e:
         raise CLIException(str(e))
+
+
+def _mtime(value):
+    """Return a file time from the server as a Unix timestamp."""
+    if isinstance(value, (int, float)) or value is None:
+        return value or 0
+    import calendar
+    import aniso8601
+    return calendar.timegm(aniso8601.parse_datetime(value).utctimetuple())
+
+
+def _remote_tree(conn, root):
+    """Map the relative paths of all files under a server folder to their
+    sizes and times, with one request per folder."""
+    from pyarkosclient.errors import NotFoundError
+    tree, folders = {}, [""]
+    while folders:
+        rel = folders.pop()
+        path = root.rstrip("/") + ("/" + rel if rel else "")
+        try:
+            data = conn._get("/files/" + transfers.encode_path(path or "/"))
+        except NotFoundError:
+            if rel:
+                raise
+            return tree
+        for x in data.get("files") or []:
+            name = (rel + "/" + x["name"]) if rel else x["name"]
+            if x.get("folder"):
+                folders.append(name)
+            else:
+                tree[name] = (x.get("size", 0), _mtime(x.get("mtime")))
+    return tree
+
+
+def _local_tree(root):
+    """Map the relative paths of all files under a local folder to their
+    sizes and times."""
+    tree = {}
+    for base, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(base, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            st = os.stat(path)
+            tree[rel] = (st.st_size, st.st_mtime)
+    return tree
+
+
+def _make_remote_folders(conn, root, rels):
+    """Create the server folders needed to hold files at these paths."""
+    from pyarkosclient.errors import NotFoundError
+    root = root.rstrip("/")
+    try:
+        conn._get("/files/" + transfers.encode_path(root or "/"))
+    except NotFoundError:
+        parent, name = root.rsplit("/", 1)
+        conn._post("/files/" + transfers.encode_path(parent or "/"),
+                   {"file": {"folder": True, "name": name}})
+    known = set([""])
+    for rel in sorted(rels):
+        parts = rel.split("/")[:-1]
+        for i in range(len(parts)):
+            folder = "/".join(parts[:i + 1])
+            if folder in known:
+                continue
+            known.add(folder)
+            parent = root + "/" + "/".join(parts[:i])
+            try:
+                conn._get("/files/" + transfers.encode_path(
+                    root + "/" + folder))
+            except NotFoundError:
+                conn._post(
+                    "/files/" + transfers.encode_path(parent.rstrip("/")),
+                    {"file": {"folder": True, "name": parts[i]}})
+
+
+@files.command()
+@click.argument("local_dir", type=click.Path(file_okay=False))
+@click.argument("remote_dir")
+@click.option("--pull", is_flag=True,
+              help="Copy from the server to the local folder instead")
+@click.option("--dry-run", is_flag=True,
+              help="Only show which files would be copied")
+@click.option("--parallel", type=click.IntRange(1, 16), default=4,
+              help="Number of files to copy at the same time")
+def sync(local_dir, remote_dir, pull, dry_run, parallel):
+    """Copy new and changed files between a local and a server folder.
+
+    Files are copied from LOCAL_DIR to REMOTE_DIR (or the other way round
+    with --pull) when they are missing on the other side, differ in size
+    or have been modified since the copy there was written. Files are
+    never deleted.
+    """
+    try:
+        conn = client()
+        if not pull and not os.path.isdir(local_dir):
+            raise CLIException("{0} is not a folder".format(local_dir))
+        remote = _remote_tree(conn, remote_dir)
+        local = _local_tree(local_dir) if os.path.isdir(local_dir) else {}
+        src, dst = (remote, local) if pull else (local, remote)
+        plan = []
+        for rel in sorted(src):
+            size, mtime = src[rel]
+            if rel not in dst:
+                plan.append((rel, size, "new"))
+            elif dst[rel][0] != size:
+                plan.append((rel, size, "size"))
+            elif mtime > dst[rel][1] + 1:
+                plan.append((rel, size, "newer"))
+        total = sum(x[1] for x in plan)
+        verb = "download" if pull else "upload"
+        for rel, size, why in plan:
+            click.echo(
+                click.style("{0: <9}".format(verb), fg="yellow") +
+                click.style(rel, fg="white", bold=True) +
+                " ({0}, {1})".format(str_fsize(size), why))
+        if dry_run or not plan:
+            logger.info('ctl:files:sync', '{0} files ({1}) to {2}'.format(
+                len(plan), str_fsize(total), verb))
+            return
+        if not pull:
+            _make_remote_folders(conn, remote_dir, [x[0] for x in plan])
+
+        def copy(rel):
+            remote_path = remote_dir.rstrip("/") + "/" + rel
+            local_path = os.path.join(local_dir, *rel.split("/"))
+            if not pull:
+                transfers.upload(conn, local_path,
+                                 os.path.dirname(remote_path) or "/",
+                                 progress=progress)
+                return
+            if not os.path.isdir(os.path.dirname(local_path)):
+                try:
+                    os.makedirs(os.path.dirname(local_path))
+                except OSError:
+                    pass
+            transfers.download(conn, remote_path, local_path,
+                               progress=progress)
+            os.utime(local_path, (time.time(), src[rel][1]))
+
+        with transfers.Progress(total) as progress:
+            errors = [(rel, str(e)) for rel, _, e in
+                      run_parallel(copy, [x[0] for x in plan], parallel) if e]
+        for rel, msg in errors:
+            logger.error('ctl:files:sync', '{0}: {1}'.format(rel, msg))
+        if errors:
+            raise CLIException("{0} of {1} files could not be copied".format(
+                len(errors), len(plan)))
+        logger.success('ctl:files:sync', 'Copied {0} files ({1})'.format(
+            len(plan), str_fsize(total)))
+    except Exception as e:
+        raise CLIException(str(e))
@@ -3,7 +3,8 @@
 import click
 
 from arkosctl import client, CLIException, logger
-from arkosctl.utils import handle_job, str_fsize
+from arkosctl.output import emit
+from arkosctl.utils import handle_job, no_wait_option, str_fsize
 
 
 @click.group()
@@ -17,6 +18,8 @@ def list_filesystems():
     """List filesystems"""
     try:
         data = client().filesystems.get()
+        if emit(data):
+            return
         for x in data:
             click.echo(
                 click.style(x["id"], fg="white", bold=True) +
@@ -50,6 +53,7 @@ def list_filesystems():
 @click.option("--encrypt", is_flag=True, prompt="Encrypt this filesystem?",
               help="Encrypt this filesystem?")
 @click.option("--password", help="Password (if encrypted filesystem)")
+@no_wait_option
 def create(name, size, encrypt, password):
     """Create a virtual disk."""
     try:
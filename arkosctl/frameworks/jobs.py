@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Relates to commands for jobs started with --no-wait."""
+import click
+import datetime
+
+from arkosctl import CLIException, logger
+from arkosctl.journal import JobJournal
+from arkosctl.output import emit
+from arkosctl.utils import handle_job, invalidate_listings
+
+
+@click.group(name='job')
+def jobs():
+    """Background job commands."""
+    pass
+
+
+def _get_job(id):
+    from pyarkosclient import Job
+    entry = JobJournal().get(id)
+    if not entry:
+        raise CLIException("No such job in the local journal")
+    return entry, Job(entry["host"], entry["id"])
+
+
+def _show_job(entry):
+    fg = {"success": "green", "running": "yellow"}.get(entry["status"], "red")
+    started = datetime.datetime.fromtimestamp(entry["started"])
+    click.echo(
+        click.style(entry["id"], fg="white", bold=True) + " " +
+        click.style("(" + entry["status"] + ")", fg=fg)
+    )
+    click.echo(
+        click.style(" * Command: ", fg="yellow") +
+        " ".join(x for x in [entry["command"], entry["label"]] if x)
+    )
+    click.echo(click.style(" * Host: ", fg="yellow") + entry["host"])
+    click.echo(
+        click.style(" * Started: ", fg="yellow") + started.strftime("%c")
+    )
+    if entry["message"]:
+        click.echo(click.style(" * Message: ", fg="yellow") + entry["message"])
+
+
+def _follow(entry, job, echo):
+    journal = JobJournal()
+    try:
+        handle_job(job, echo=echo)
+    finally:
+        if job.status != "running":
+            msg = job.message["message"] if job.message else None
+            journal.update(entry["host"], entry["id"], job.status, msg)
+
+
+@jobs.command(name='list')
+def list_jobs():
+    """List jobs started with --no-wait."""
+    try:
+        data = JobJournal().list()
+        if emit(data):
+            return
+        if not data:
+            logger.info('ctl:job:list', 'No jobs found')
+        for x in data:
+            _show_job(x)
+    except Exception as e:
+        raise CLIException(str(e))
+
+
+@jobs.command()
+@click.argument("id")
+def status(id):
+    """Check the status of a job."""
+    try:
+        entry, job = _get_job(id)
+        if entry["status"] == "running":
+            job.check()
+            invalidate_listings(job)
+            msg = job.message["message"] if job.message else None
+            JobJournal().update(entry["host"], entry["id"], job.status, msg)
+            entry = JobJournal().get(id)
+        _show_job(entry)
+    except Exception as e:
+        raise CLIException(str(e))
+
+
+@jobs.command()
+@click.argument("id")
+def wait(id):
+    """Wait for a job to finish."""
+    try:
+        _follow(*_get_job(id), echo=False)
+        logger.success('ctl:job:wait', 'Job {0} finished'.format(id))
+    except Exception as e:
+        raise CLIException(str(e))
+
+
+@jobs.command()
+@click.argument("id")
+def tail(id):
+    """Show a job's messages until it finishes."""
+    try:
+        _follow(*_get_job(id), echo=True)
+    except Exception as e:
+        raise CLIException(str(e))
@@ -2,6 +2,7 @@
 import click
 
 from arkosctl import client, CLIException, logger
+from arkosctl.output import emit
 from arkosctl.utils import str_fsize
 
 
@@ -16,6 +17,8 @@ def list_networks():
     """List system networks"""
     try:
         data = client().networks.get()
+        if emit(data):
+            return
         for x in data:
             click.echo(
                 click.style(x["id"], fg="white", bold=True) +
@@ -49,6 +52,8 @@ def list_interfaces():
     """List system network interfaces"""
     try:
         data = client().networks.get_interfaces()
+        if emit(data):
+            return
         for x in data:
             click.echo(
                 click.style(x["id"], fg="white", bold=True) +
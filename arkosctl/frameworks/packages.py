@@ -2,7 +2,7 @@
 import click
 
 from arkosctl import client, CLIException, logger
-from arkosctl.utils import abort_if_false, handle_job
+from arkosctl.utils import abort_if_false, handle_job, no_wait_option
 
 
 @click.group(name='pkg')
@@ -16,6 +16,7 @@ def packages():
 @click.option(
     "--yes", is_flag=True, callback=abort_if_false, expose_value=False,
     prompt='Are you sure you want to install these packages?')
+@no_wait_option
 def install(name):
     """Install system package(s)"""
     try:
@@ -32,6 +33,7 @@ def install(name):
 @click.option(
     "--yes", is_flag=True, callback=abort_if_false, expose_value=False,
     prompt='Are you sure you want to remove these packages?')
+@no_wait_option
 def remove(name, purge):
     """Removes system package(s)"""
     try:
@@ -53,6 +55,7 @@ def update():
 
 @packages.command()
 @click.option("--yes", is_flag=True)
+@no_wait_option
 def upgrade(yes):
     """Upgrades all system packages"""
     try:
@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
+import base64
 import click
+import csv
+import hashlib
+import io
+import os
 
 from arkosctl import client, CLIException, logger
-from arkosctl.utils import abort_if_false
+from arkosctl.cache import NameIndex
+from arkosctl.output import emit
+from arkosctl.utils import abort_if_false, cache_path, progress_bar
+from arkosctl.utils import run_parallel
 
 
 @click.group()
@@ -23,11 +31,49 @@ def domain():
     pass
 
 
+def _fetch(kind):
+    if kind == "users":
+        return client().roles.get_users
+    return client().roles.get_groups
+
+
+def _resolve(kind, name):
+    """Return the ID of a named user or group.
+
+    IDs come from the local name index when possible, after checking with
+    a single lookup by ID that they still belong to that name. Otherwise
+    the server is asked for the name and the index is updated.
+    """
+    from pyarkosclient.errors import NotFoundError
+    index = NameIndex(client().host)
+    id = index.get(kind, name)
+    if id is not None:
+        try:
+            data = _fetch(kind)(id=id)
+        except NotFoundError:
+            data = None
+        if data and data["name"] == name:
+            return id
+        index.drop(kind, name)
+    data = _fetch(kind)(name=name) or []
+    data = [data] if isinstance(data, dict) else data
+    index.update(kind, {x["name"]: x["id"] for x in data})
+    ids = [x["id"] for x in data if x["name"] == name]
+    if not ids:
+        raise CLIException(
+            "No such user" if kind == "users" else "No such group")
+    return ids[0]
+
+
 @user.command(name='list')
 def list_users():
     """List users"""
     try:
         data = client().roles.get_users()
+        NameIndex(client().host).update(
+            "users", {x["name"]: x["id"] for x in data})
+        if emit(data):
+            return
         for x in data:
             click.echo(
                 click.style(x["name"], fg="white", bold=True) +
@@ -76,13 +122,179 @@ def list_users():
 def add_user(name, password, domain, first_name, last_name, admin, sudo):
     """Add a user to arkOS LDAP"""
     try:
-        client().roles.add_user(
+        data = client().roles.add_user(
             name, password, domain, first_name, last_name, admin, sudo)
+        if data:
+            NameIndex(client().host).update("users", {name: data["id"]})
         logger.success('ctl:usr:add', 'Added {0}'.format(name))
     except Exception as e:
         raise CLIException(str(e))
 
 
+def _flag(value):
+    return str(value or "").strip().lower() in ("1", "true", "yes", "y")
+
+
+def _csv_rows(path):
+    """Yield `(line, fields)` for each row of a CSV file with a header."""
+    with io.open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, {
+                "name": row.get("name"), "password": row.get("password"),
+                "domain": row.get("domain"),
+                "first_name": row.get("first_name"),
+                "last_name": row.get("last_name"),
+                "admin": _flag(row.get("admin")),
+                "sudo": _flag(row.get("sudo"))
+            }
+
+
+def _ldif_entries(f):
+    """Yield `(line, attributes)` for each entry of an LDIF stream."""
+    entry, start, last = {}, 0, None
+    for num, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")
+        if line.startswith(" ") and last:
+            entry[last][-1] += line[1:]
+            continue
+        if not line:
+            if entry:
+                yield start, entry
+            entry, last = {}, None
+            continue
+        if line.startswith("#") or ":" not in line:
+            continue
+        attr, value = line.split(":", 1)
+        last = attr.lower()
+        if not entry:
+            start = num
+        entry.setdefault(last, []).append(value)
+    if entry:
+        yield start, entry
+
+
+def _ldif_value(entry, attr):
+    values = entry.get(attr.lower())
+    if not values:
+        return None
+    value = values[0]
+    if value.startswith(":"):
+        return base64.b64decode(value[1:].strip()).decode("utf-8")
+    return value.strip()
+
+
+def _ldif_rows(path):
+    """Yield `(line, fields)` for each entry of an LDIF file with a uid."""
+    with io.open(path, "r", encoding="utf-8") as f:
+        for num, entry in _ldif_entries(f):
+            if "uid" not in entry:
+                continue
+            mail = _ldif_value(entry, "mail") or ""
+            yield num, {
+                "name": _ldif_value(entry, "uid"),
+                "password": _ldif_value(entry, "userPassword"),
+                "domain": mail.split("@", 1)[1] if "@" in mail else None,
+                "first_name": _ldif_value(entry, "givenName") or
+                _ldif_value(entry, "cn"),
+                "last_name": _ldif_value(entry, "sn"),
+                "admin": False, "sudo": False
+            }
+
+
+def _import_user(conn, row):
+    if not row["name"] or not row["password"]:
+        raise CLIException("A name and a password are required")
+    if not row["domain"] or not row["first_name"]:
+        raise CLIException("A domain and a first name are required")
+    return conn.roles.add_user(
+        row["name"], row["password"], row["domain"], row["first_name"],
+        row["last_name"] or "", row["admin"], row["sudo"])
+
+
+@user.command(name='import')
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format", "fmt", type=click.Choice(["csv", "ldif"]), default=None,
+    help="File format (default: guessed from the file extension)")
+@click.option(
+    "--domain", default=None, help="Domain for rows that do not name one")
+@click.option(
+    "--workers", type=click.IntRange(1, 64), default=8,
+    help="Number of users to create at the same time")
+@click.option(
+    "--checkpoint", type=click.Path(dir_okay=False), default=None,
+    help="File recording imported users, to resume an interrupted run")
+def import_users(path, fmt, domain, workers, checkpoint):
+    """Add users to arkOS LDAP from a CSV or LDIF file
+
+    CSV files need a header row with the columns name, password, domain,
+    first_name, last_name, admin and sudo. LDIF entries are read from their
+    uid, userPassword, mail, givenName (or cn) and sn attributes. Passwords
+    must be given in plain text.
+
+    Users that were created are recorded in a checkpoint file, so running
+    the same import again only retries the rows that failed or were not
+    reached.
+    """
+    try:
+        fmt = fmt or ("ldif" if path.lower().endswith(".ldif") else "csv")
+        reader = _ldif_rows if fmt == "ldif" else _csv_rows
+        if not checkpoint:
+            key = hashlib.sha1("{0}|{1}".format(
+                client().host, os.path.abspath(path)).encode("utf-8"))
+            checkpoint = cache_path(
+                "import-{0}.done".format(key.hexdigest()[:12]))
+        done = set()
+        if os.path.exists(checkpoint):
+            with io.open(checkpoint, "r", encoding="utf-8") as f:
+                done = set(x.strip() for x in f if x.strip())
+        total = sum(1 for _, row in reader(path) if row["name"] not in done)
+        if not total:
+            if os.path.exists(checkpoint):
+                os.unlink(checkpoint)
+            logger.info('ctl:usr:import', 'Nothing left to import')
+            return
+        conn = client()
+        conn.connect()
+        errors, added = [], {}
+
+        def rows():
+            for num, row in reader(path):
+                if row["name"] not in done:
+                    row["domain"] = row["domain"] or domain
+                    yield num, row
+
+        with io.open(checkpoint, "a", encoding="utf-8") as log, \
+                progress_bar(total, "Importing") as bar:
+            for (num, row), data, e in run_parallel(
+                    lambda x: _import_user(conn, x[1]), rows(), workers):
+                bar.update(1)
+                if e:
+                    errors.append((num, row["name"], str(e)))
+                    continue
+                if data:
+                    added[row["name"]] = data["id"]
+                log.write(row["name"] + u"\n")
+                log.flush()
+        if added:
+            NameIndex(conn.host).update("users", added)
+        for num, name, msg in sorted(errors):
+            click.echo(
+                click.style("Line {0} ({1}): ".format(num, name or "?"),
+                            fg="white", bold=True) +
+                click.style(msg, fg="red"), err=True)
+        if errors:
+            raise CLIException(
+                "{0} of {1} users could not be imported; run the same "
+                "command again to retry them".format(len(errors), total))
+        os.unlink(checkpoint)
+        logger.success(
+            'ctl:usr:import', 'Imported {0} users'.format(len(added)))
+    except Exception as e:
+        raise CLIException(str(e))
+
+
 @user.command(name='mod')
 @click.argument("name")
 @click.option(
@@ -98,11 +310,7 @@ def add_user(name, password, domain, first_name, last_name, admin, sudo):
 def mod_user(name, domain, first_name, last_name, admin, sudo):
     """Edit an arkOS LDAP user"""
     try:
-        users = client().roles.get_users()
-        uid = [y["id"] for y in users if y["name"] == name]
-        if not uid:
-            raise CLIException("No such user")
-        uid = uid[0]
+        uid = _resolve("users", name)
         client().roles.edit_user(
             uid, domain, first_name, last_name, "", admin, sudo)
         logger.success('ctl:usr:mod', 'Modified {0}'.format(name))
@@ -117,11 +325,7 @@ def mod_user(name, domain, first_name, last_name, admin, sudo):
 def passwd(name, password):
     """Change an arkOS LDAP user password"""
     try:
-        users = client().roles.get_users()
-        uid = [y["id"] for y in users if y["name"] == name]
-        if not uid:
-            raise CLIException("No such user")
-        uid = uid[0]
+        uid = _resolve("users", name)
         client().roles.edit_user(uid, passwd=password)
         logger.success(
             'ctl:usr:passwd', 'Password changed for {0}'.format(name)
@@ -138,12 +342,8 @@ def passwd(name, password):
 def delete_user(name):
     """Delete an arkOS LDAP user"""
     try:
-        users = client().roles.get_users()
-        uid = [y["id"] for y in users if y["name"] == name]
-        if not uid:
-            raise CLIException("No such user")
-        uid = uid[0]
-        client().roles.delete_user(uid)
+        client().roles.delete_user(_resolve("users", name))
+        NameIndex(client().host).drop("users", name)
         logger.success('ctl:usr:delete', 'Deleted {0}'.format(name))
     except Exception as e:
         raise CLIException(str(e))
@@ -154,6 +354,10 @@ def list_groups():
     """List groups"""
     try:
         data = client().roles.get_groups()
+        NameIndex(client().host).update(
+            "groups", {x["name"]: x["id"] for x in data})
+        if emit(data):
+            return
         for x in data:
             click.echo(
                 click.style(x["name"], fg="white", bold=True) +
@@ -173,7 +377,9 @@ def list_groups():
 def add_group(name, users):
     """Add a group to arkOS LDAP"""
     try:
-        client().roles.add_group(name, users)
+        data = client().roles.add_group(name, users)
+        if data:
+            NameIndex(client().host).update("groups", {name: data["id"]})
         logger.success('ctl:grp:add', 'Added {0}'.format(name))
     except Exception as e:
         raise CLIException(str(e))
@@ -186,11 +392,8 @@ def add_group(name, users):
 def mod_group(name, operation, username):
     """Add/remove users from an arkOS LDAP group"""
     try:
-        groups = client().roles.get_groups()
-        gid = [y for y in groups if y["name"] == name]
-        if not gid:
-            raise CLIException("No such group")
-        gid, members = gid[0]["id"], gid[0]["members"]
+        gid = _resolve("groups", name)
+        members = client().roles.get_groups(id=gid)["users"]
         if operation == "add":
             members.append(username)
         else:
@@ -209,12 +412,8 @@ def mod_group(name, operation, username):
 def delete_group(name):
     """Delete an arkOS LDAP group"""
     try:
-        groups = client().roles.get_groups()
-        gid = [y["id"] for y in groups if y["name"] == name]
-        if not gid:
-            raise CLIException("No such group")
-        gid = gid[0]
-        client().roles.delete_group(gid)
+        client().roles.delete_group(_resolve("groups", name))
+        NameIndex(client().host).drop("groups", name)
         logger.success('ctl:grp:delete', 'Deleted {0}'.format(name))
     except Exception as e:
         raise CLIException(str(e))
@@ -225,6 +424,8 @@ def list_domains():
     """List domains"""
     try:
         data = client().roles.get_domains()
+        if emit(data):
+            return
         for x in data:
             click.echo(x["id"])
     except Exception as e:
@@ -2,6 +2,7 @@
 import click
 
 from arkosctl import client, CLIException, logger
+from arkosctl.output import emit
 
 
 @click.group(name='sec')
@@ -15,6 +16,8 @@ def list():
     """List security policies"""
     try:
         data = client().security.get_policies()
+        if emit(data):
+            return
         for x in data:
             pol, fg = ("Allow All", "green") if x["policy"] == 2 else \
                 (("Local Only", "yellow") if x["policy"] == 1 else
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 import click
+import fnmatch
+
+from collections import OrderedDict
 
 from arkosctl import client, CLIException, logger
+from arkosctl.output import emit, NAME_STYLE, table
+from arkosctl.utils import run_parallel
 
 
 @click.group(name='svc')
@@ -14,88 +19,161 @@ def services():
 def list_services():
     """List all services and statuses."""
     try:
-        data = []
         svcs = client().services.get()
-        llen = len(sorted(svcs, key=lambda x: len(x["id"]))[-1]["id"])
-        for x in svcs:
-            data.append(
-                click.style(
-                    '{name: <{fill}}'.format(name=x["id"], fill=llen + 3),
-                    fg="white", bold=True) +
-                click.style(
-                    x["state"].capitalize(),
-                    fg="green" if x["state"] == "running" else "red") + "   " +
-                click.style(
-                    "Enabled" if x["enabled"] else "Disabled",
-                    fg="green" if x["enabled"] else "red")
-            )
-        click.echo_via_pager("\n".join(data))
+        if emit(svcs):
+            return
+        if not svcs:
+            logger.info('ctl:svc:list', 'No services found')
+            return
+        table([
+            [(x["id"], NAME_STYLE),
+             (x["state"].capitalize(),
+              "green" if x["state"] == "running" else "red"),
+             ("Enabled" if x["enabled"] else "Disabled",
+              "green" if x["enabled"] else "red")]
+            for x in svcs
+        ], pager=True)
     except Exception as e:
         raise CLIException(str(e))
 
 
+# Operation: (past tense for messages, whether it must leave it running)
+OPERATIONS = {
+    "start": ("Started", True),
+    "stop": ("Stopped", False),
+    "restart": ("Restarted", True),
+    "enable": ("Enabled", False),
+    "disable": ("Disabled", False)
+}
+
+
+def _resolve(conn, names):
+    """Expand shell-style patterns against a single listing of services."""
+    if not any(set(x) & set("*?[") for x in names):
+        return list(OrderedDict.fromkeys(names))
+    ids = [x["id"] for x in conn.services.get()]
+    resolved = []
+    for name in names:
+        matched = fnmatch.filter(ids, name) if set(name) & set("*?[") \
+            else [name]
+        if not matched:
+            raise CLIException("No service matches {0}".format(name))
+        resolved += matched
+    return list(OrderedDict.fromkeys(resolved))
+
+
+def _operate(conn, operation, name):
+    """Run an operation on a service; return `(service, error)`.
+
+    The service returned by the operation is used to check its new state,
+    falling back to fetching it only if the server sent nothing back.
+    """
+    svc = getattr(conn.services, operation)(name)
+    if OPERATIONS[operation][1]:
+        svc = svc or conn.services.get(id=name)
+        if svc["state"] != "running":
+            return svc, "Failed to {0} {1}".format(operation, name)
+    return svc, None
+
+
+def _show_results(results):
+    rows = []
+    for name, svc, error in results:
+        row = [(name, NAME_STYLE)]
+        if error:
+            row.append((error, "red"))
+        elif svc:
+            row += [
+                (svc["state"].capitalize(),
+                 "green" if svc["state"] == "running" else "red"),
+                ("Enabled" if svc["enabled"] else "Disabled",
+                 "green" if svc["enabled"] else "red")]
+        else:
+            row.append(("OK", "green"))
+        rows.append(row)
+    table(rows)
+
+
+def _run(operation, names, parallel):
+    """Run an operation on several services at once and report on each."""
+    conn = client()
+    targets = _resolve(conn, names)
+    tag = 'ctl:svc:{0}'.format(operation)
+    if len(targets) == 1:
+        svc, error = _operate(conn, operation, targets[0])
+        if error:
+            raise CLIException(error)
+        logger.success(tag, '{0} {1}'.format(
+            OPERATIONS[operation][0], targets[0]))
+        return
+    done = {}
+    for name, result, e in run_parallel(
+            lambda x: _operate(conn, operation, x), targets, parallel):
+        done[name] = result if not e else (None, str(e))
+    results = [(x,) + done[x] for x in targets]
+    _show_results(results)
+    failed = len([x for x in results if x[2]])
+    if failed:
+        raise CLIException("{0} of {1} services could not be {2}".format(
+            failed, len(results), OPERATIONS[operation][0].lower()))
+
+
 @services.command()
-@click.argument("name")
-def start(name):
-    """Start a service"""
+@click.argument("names", nargs=-1, required=True)
+@click.option("--parallel", type=click.IntRange(1, 32), default=4,
+              help="Number of services to act on at the same time")
+def start(names, parallel):
+    """Start services (names or patterns like 'php*')"""
     try:
-        client().services.start(name)
-        svc = client().services.get(id=name)
-        state = svc["state"]
-        if state == "running":
-            logger.success('ctl:svc:start', 'Started {0}'.format(name))
-        else:
-            logger.error('ctl:svc:start', 'Failed to start {0}'.format(name))
+        _run("start", names, parallel)
     except Exception as e:
         raise CLIException(str(e))
 
 
 @services.command()
-@click.argument("name")
-def stop(name):
-    """Stop a service"""
+@click.argument("names", nargs=-1, required=True)
+@click.option("--parallel", type=click.IntRange(1, 32), default=4,
+              help="Number of services to act on at the same time")
+def stop(names, parallel):
+    """Stop services (names or patterns like 'php*')"""
     try:
-        client().services.stop(name)
-        logger.success('ctl:svc:stop', 'Stopped {0}'.format(name))
+        _run("stop", names, parallel)
     except Exception as e:
         raise CLIException(str(e))
 
 
 @services.command()
-@click.argument("name")
-def restart(name):
-    """Restart a service"""
+@click.argument("names", nargs=-1, required=True)
+@click.option("--parallel", type=click.IntRange(1, 32), default=4,
+              help="Number of services to act on at the same time")
+def restart(names, parallel):
+    """Restart services (names or patterns like 'php*')"""
     try:
-        svc = client().services.restart(name)
-        state = svc["state"]
-        if state == "running":
-            logger.success('ctl:svc:restart', 'Restarted {0}'.format(name))
-        else:
-            logger.error(
-                'ctl:svc:restart', 'Failed to restart {0}'.format(name)
-            )
+        _run("restart", names, parallel)
     except Exception as e:
         raise CLIException(str(e))
 
 
 @services.command()
-@click.argument("name")
-def enable(name):
-    """Enable a service on boot"""
+@click.argument("names", nargs=-1, required=True)
+@click.option("--parallel", type=click.IntRange(1, 32), default=4,
+              help="Number of services to act on at the same time")
+def enable(names, parallel):
+    """Enable services on boot (names or patterns like 'php*')"""
     try:
-        client().services.enable(name)
-        logger.success('ctl:svc:enable', 'Enabled {0}'.format(name))
+        _run("enable", names, parallel)
     except Exception as e:
         raise CLIException(str(e))
 
 
 @services.command()
-@click.argument("name")
-def disable(name):
-    """Disable a service on boot"""
+@click.argument("names", nargs=-1, required=True)
+@click.option("--parallel", type=click.IntRange(1, 32), default=4,
+              help="Number of services to act on at the same time")
+def disable(names, parallel):
+    """Disable services on boot (names or patterns like 'php*')"""
     try:
-        client().services.disable(name)
-        logger.success('ctl:svc:disable', 'Disabled {0}'.format(name))
+        _run("disable", names, parallel)
     except Exception as e:
         raise CLIException(str(e))
 
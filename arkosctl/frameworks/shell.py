@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Relates to the interactive command shell."""
+import click
+import shlex
+import time
+
+from arkosctl import CLIException
+from arkosctl.utils import invoke_line
+
+try:
+    import readline
+except ImportError:
+    readline = None
+
+try:
+    # Python 2
+    input = raw_input
+except NameError:
+    # Python 3
+    pass
+
+
+def _complete_words(root, words):
+    """Return possible completions for the next word of a command line."""
+    group = root.command
+    for word in words:
+        if not isinstance(group, click.MultiCommand):
+            break
+        cmd = group.get_command(root, word)
+        if cmd is None:
+            break
+        group = cmd
+    else:
+        if isinstance(group, click.MultiCommand):
+            names = group.list_commands(root)
+            if group is root.command:
+                names = [x for x in names if x != "shell"]
+            return names + (["exit"] if group is root.command else [])
+    if isinstance(group, click.Command):
+        return [o for p in group.params for o in getattr(p, "opts", [])
+                if o.startswith("-")] + ["--help"]
+    return []
+
+
+def _set_completer(root):
+    def completer(text, state):
+        line = readline.get_line_buffer()[:readline.get_begidx()]
+        try:
+            words = shlex.split(line)
+        except ValueError:
+            return None
+        opts = [x for x in _complete_words(root, words)
+                if x.startswith(text)]
+        return (opts[state] + " ") if state < len(opts) else None
+    readline.set_completer(completer)
+    readline.set_completer_delims(" \t")
+    readline.parse_and_bind("tab: complete")
+
+
+@click.command()
+@click.option("--timing/--no-timing", default=True,
+              help="Show how long each command took")
+@click.pass_context
+def shell(ctx, timing):
+    """Interactive shell over a single connection."""
+    root = ctx.find_root()
+    if readline:
+        _set_completer(root)
+    client = root.obj["client"]
+    prompt = "arkosctl ({0})> ".format(client.host or "not connected")
+    while True:
+        try:
+            line = input(prompt)
+        except EOFError:
+            click.echo()
+            break
+        except KeyboardInterrupt:
+            click.echo()
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            CLIException(str(e)).show()
+            continue
+        if not args:
+            continue
+        if args[0] in ["exit", "quit"]:
+            break
+        if args[0] == "shell":
+            continue
+        start = time.time()
+        try:
+            invoke_line(ctx, args)
+        except click.ClickException as e:
+            e.show()
+        except click.Abort:
+            click.echo("Aborted!", err=True)
+        except (SystemExit, KeyboardInterrupt):
+            pass
+        if timing:
+            click.secho(
+                "({0:.2f}s)".format(time.time() - start), dim=True, err=True)
@@ -2,7 +2,8 @@
 import click
 
 from arkosctl import client, CLIException, logger
-from arkosctl.utils import abort_if_false, handle_job
+from arkosctl.output import emit
+from arkosctl.utils import abort_if_false, handle_job, no_wait_option
 
 
 @click.group(name='sites')
@@ -12,6 +13,8 @@ def websites():
 
 
 def _list_websites(sites):
+    if emit(sites):
+        return
     if not sites:
         logger.info('ctl:site:list', 'No websites found')
     for x in sorted(sites, key=lambda x: x["id"]):
@@ -56,6 +59,7 @@ def list_sites():
     "--port", prompt=True, type=int,
     help="The port number to make the site available on (default 80)")
 @click.option("--extra-data", help="Any extra data your site might require")
+@no_wait_option
 def create(id, site_type, address, port, extra_data):
     """Create a website"""
     try:
@@ -135,6 +139,7 @@ def update(id):
 @click.option(
     "--yes", is_flag=True, callback=abort_if_false, expose_value=False,
     prompt='Are you sure you want to remove this site?')
+@no_wait_option
 def remove(id):
     """Remove a website"""
     try:
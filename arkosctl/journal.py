@@ -0,0 +1,47 @@
+"""Local journal of jobs started without waiting for them."""
+import sqlite3
+import time
+
+from arkosctl.utils import cache_path
+
+
+class JobJournal(object):
+    """Record jobs in a SQLite database so they can be re-attached later."""
+
+    def __init__(self, path=None, keep=30 * 86400):
+        self.path = path or cache_path("jobs.db")
+        self.keep = keep
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT, host TEXT, command TEXT, label TEXT, started REAL, "
+            "status TEXT, message TEXT, PRIMARY KEY (host, id))")
+
+    def record(self, host, id, command, label=""):
+        """Add a newly started job."""
+        with self.db:
+            self.db.execute(
+                "DELETE FROM jobs WHERE started < ?",
+                (time.time() - self.keep,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (id, host, command, label, time.time(), "running", None))
+
+    def update(self, host, id, status, message=None):
+        """Save the last known status of a job."""
+        with self.db:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, message = ? "
+                "WHERE host = ? AND id = ?", (status, message, host, id))
+
+    def get(self, id):
+        """Return the most recent job with this ID, or None."""
+        return self.db.execute(
+            "SELECT * FROM jobs WHERE id = ? ORDER BY started DESC",
+            (id,)).fetchone()
+
+    def list(self):
+        """Return all recorded jobs, most recent last."""
+        return self.db.execute(
+            "SELECT * FROM jobs ORDER BY started").fetchall()
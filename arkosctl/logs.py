@@ -62,6 +62,12 @@ class LoggingControl:
 
 
 class StreamFormatter(logging.Formatter):
+    def __init__(self, fmt):
+        # Format is applied manually with str.format(); bypass the `%`-style
+        # validation done by newer versions of `logging`.
+        logging.Formatter.__init__(self)
+        self._fmt = fmt
+
     def format(self, record):
         if type(record.msg) in [str, bytes]:
             data = {
@@ -0,0 +1,122 @@
+"""Output of listings, as text tables or as JSON, NDJSON and CSV."""
+import click
+import csv
+import datetime
+import json
+
+
+def output_format():
+    """Return the output format chosen for this invocation."""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return "text"
+    return (ctx.find_root().obj or {}).get("output", "text")
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def _dumps(value):
+    return json.dumps(value, default=_default, sort_keys=True)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple, set)):
+        return _dumps(value)
+    return value
+
+
+def emit(records, fields=None):
+    """Write records in the machine-readable output format, if one is set.
+
+    Returns False without writing anything when plain text output was
+    asked for, so a listing can go on to render its usual text. JSON is
+    written as a single list; NDJSON as one record per line, flushed as
+    each is written; CSV with a header row of `fields` (by default every
+    key found in the records), nested values being written as JSON.
+    """
+    fmt = output_format()
+    if fmt == "text":
+        return False
+    out = click.get_text_stream("stdout")
+    records = [dict(x) for x in records or []]
+    if fmt == "json":
+        out.write(_dumps(records) + "\n")
+    elif fmt == "ndjson":
+        for x in records:
+            out.write(_dumps(x) + "\n")
+            out.flush()
+    else:
+        if fields is None:
+            fields = sorted(set(k for x in records for k in x))
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(fields)
+        for x in records:
+            writer.writerow([_cell(x.get(k)) for k in fields])
+    out.flush()
+    return True
+
+
+# Number of lines written to the terminal at once by `table()`.
+BLOCK_LINES = 1000
+
+# Style of the first column of a listing, naming each item.
+NAME_STYLE = {"fg": "white", "bold": True}
+
+
+def table(rows, gap=3, pager=False):
+    """Write rows of cells as a text table with aligned columns.
+
+    Each cell is either a string or a `(text, style)` tuple, `style` being
+    a colour name or a dict of `click.style` arguments; every column but
+    the last is padded to its widest cell plus `gap` spaces.
+
+    Widths are found in one pass over the rows, and styling is only done
+    when stdout is a terminal, each style's escape codes being worked out
+    once. Lines are echoed in blocks of `BLOCK_LINES`, or all at once
+    through the pager if `pager` is set and stdout is a terminal. Nothing
+    is written for no rows.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    widths = [0] * max(len(x) for x in rows)
+    for row in rows:
+        for i, cell in enumerate(row):
+            size = len(cell[0] if type(cell) is tuple else cell)
+            if size > widths[i]:
+                widths[i] = size
+    color = click.get_text_stream("stdout").isatty()
+    codes = {}
+    lines = []
+    for row in rows:
+        cells = []
+        last = len(row) - 1
+        for i, cell in enumerate(row):
+            text, style = cell if type(cell) is tuple else (cell, None)
+            if i != last:
+                text = text.ljust(widths[i] + gap)
+            if color and style:
+                key = style if type(style) is str else \
+                    frozenset(style.items())
+                if key not in codes:
+                    codes[key] = click.style(
+                        "\0", **({"fg": style} if key is style else style)
+                    ).split("\0")
+                text = codes[key][0] + text + codes[key][1]
+            cells.append(text)
+        lines.append("".join(cells))
+    if pager and color:
+        click.echo_via_pager("\n".join(lines))
+        return
+    for i in range(0, len(lines), BLOCK_LINES):
+        click.echo("\n".join(lines[i:i + BLOCK_LINES]))
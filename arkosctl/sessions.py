@@ -0,0 +1,72 @@
+"""On-disk cache of authenticated API sessions."""
+import json
+import os
+import tempfile
+import threading
+import time
+
+from arkosctl.utils import cache_path
+
+# Serializes the read-modify-write of the cache file between threads.
+_lock = threading.Lock()
+
+
+class SessionCache(object):
+    """Store API tokens per host and user, readable only by their owner."""
+
+    def __init__(self, path=None, ttl=3600):
+        self.path = path or cache_path("sessions.json")
+        self.ttl = ttl
+
+    def _key(self, host, user):
+        return "{0}@{1}".format(user, host)
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save(self, data):
+        try:
+            fd, tmp = tempfile.mkstemp(
+                prefix=os.path.basename(self.path) + ".",
+                dir=os.path.dirname(self.path))
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.chmod(tmp, 0o600)
+            os.rename(tmp, self.path)
+        except (IOError, OSError, TypeError, ValueError):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def get(self, host, user):
+        """Return a cached token, or None if missing or expired."""
+        entry = self._load().get(self._key(host, user))
+        if not entry or entry["expires"] < time.time():
+            return None
+        return entry["token"]
+
+    def set(self, host, user, token):
+        """Save a token for this host and user."""
+        with _lock:
+            data = self._load()
+            now = time.time()
+            data = {k: v for k, v in data.items() if v["expires"] >= now}
+            data[self._key(host, user)] = {
+                "token": token, "expires": now + self.ttl
+            }
+            self._save(data)
+
+    def drop(self, host, user):
+        """Forget the token for this host and user."""
+        with _lock:
+            data = self._load()
+            if data.pop(self._key(host, user), None):
+                self._save(data)
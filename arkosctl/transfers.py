@@ -0,0 +1,443 @@
+"""Streaming file transfers to and from arkOS servers."""
+import base64
+import binascii
+import click
+import contextlib
+import hashlib
+import io
+import json
+import os
+import requests
+import threading
+import time
+
+from arkosctl import CLIException
+from arkosctl.utils import str_fsize
+
+# Bytes read from or written to the network at a time.
+CHUNK_SIZE = 1024 * 1024
+
+
+class Progress(object):
+    """Progress of a transfer on stderr, with throughput and time left.
+
+    Nothing is shown unless stderr is a terminal. Use it as a context
+    manager and call `update(n)` for every `n` bytes transferred.
+    """
+
+    def __init__(self, total=None, done=0, label=""):
+        self.stream = click.get_text_stream("stderr")
+        self.enabled = self.stream.isatty()
+        self.total = total
+        self.done = self.initial = done
+        self.label = label
+        self.start = self.shown = time.time()
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self._show(time.time(), True)
+        return False
+
+    def update(self, n):
+        with self.lock:
+            self.done += n
+            now = time.time()
+            if self.enabled and now - self.shown >= 0.2:
+                self.shown = now
+                self._show(now)
+
+    def _show(self, now, final=False):
+        rate = (self.done - self.initial) / max(now - self.start, 0.001)
+        parts = [self.label] if self.label else []
+        if self.total:
+            parts.append("{0} / {1}".format(
+                str_fsize(self.done), str_fsize(self.total)))
+            parts.append("{0: >3}%".format(self.done * 100 // self.total))
+        else:
+            parts.append(str_fsize(self.done))
+        parts.append(str_fsize(rate) + "/s")
+        if self.total and rate and not final:
+            left = int((self.total - self.done) / rate)
+            parts.append("{0}:{1:02d} left".format(left // 60, left % 60))
+        click.echo("\r\033[K" + "  ".join(parts), file=self.stream,
+                   nl=final)
+
+
+def file_sha256(path, size=None):
+    """Return a running SHA-256 hash of the first `size` bytes of a file."""
+    digest = hashlib.sha256()
+    left = os.path.getsize(path) if size is None else size
+    with open(path, "rb") as f:
+        while left > 0:
+            chunk = f.read(min(CHUNK_SIZE, left))
+            if not chunk:
+                break
+            digest.update(chunk)
+            left -= len(chunk)
+    return digest
+
+
+def _server_sha256(r):
+    """Return the SHA-256 the server gives for the whole file, if any."""
+    for item in r.headers.get("Digest", "").split(","):
+        algo, _, value = item.strip().partition("=")
+        if algo.lower() == "sha-256" and value:
+            return binascii.hexlify(base64.b64decode(value)).decode("ascii")
+    return r.headers.get("X-Checksum-SHA256")
+
+
+def _content_range(r):
+    """Return `(start, total)` from a 206 response's Content-Range."""
+    unit, _, spec = r.headers.get("Content-Range", "").partition(" ")
+    span, _, total = spec.partition("/")
+    start = span.partition("-")[0]
+    if unit != "bytes" or not start.isdigit():
+        raise CLIException("The server sent an invalid Content-Range")
+    return int(start), int(total) if total.isdigit() else None
+
+
+def _read_state(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_state(path, state):
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+
+# Compression methods by file name suffix.
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+
+def compression_for(path):
+    """Guess the compression method for a file from its name, or None."""
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise CLIException(
+            "zstd compression needs the zstandard package "
+            "(pip install arkosctl[zstd])")
+    return zstandard
+
+
+@contextlib.contextmanager
+def compressed_writer(f, method=None):
+    """Wrap a binary file so that data written to it is compressed."""
+    if method == "gzip":
+        import gzip
+        writer = gzip.GzipFile(fileobj=f, mode="wb")
+    elif method == "zstd":
+        writer = _zstandard().ZstdCompressor().stream_writer(f)
+    else:
+        yield f
+        return
+    try:
+        yield writer
+    finally:
+        if method == "zstd":
+            writer.flush(_zstandard().FLUSH_FRAME)
+        else:
+            writer.close()
+
+
+def compressed_reader(f, method=None):
+    """Wrap a binary file so that data read from it is decompressed."""
+    if method == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    elif method == "zstd":
+        return _zstandard().ZstdDecompressor().stream_reader(f)
+    return f
+
+
+def _write_body(r, f, compression, progress):
+    received = 0
+    with compressed_writer(f, compression) as w:
+        for chunk in r.iter_content(CHUNK_SIZE):
+            w.write(chunk)
+            received += len(chunk)
+            if progress:
+                progress.update(len(chunk))
+    return received
+
+
+def save_stream(r, dest, compression=None, progress=None):
+    """Write the body of a streamed response to `dest`, compressing it.
+
+    Data is written a chunk at a time to `dest + ".part"`, which is moved
+    into place once the whole response has been read; a `dest` of `-`
+    writes it to standard output instead. Returns the number of bytes
+    received.
+    """
+    if dest == "-":
+        try:
+            out = click.get_binary_stream("stdout")
+            received = _write_body(r, out, compression, progress)
+            out.flush()
+            return received
+        finally:
+            r.close()
+    part = dest + ".part"
+    try:
+        with open(part, "wb") as f:
+            received = _write_body(r, f, compression, progress)
+    except BaseException:
+        if os.path.exists(part):
+            os.unlink(part)
+        raise
+    finally:
+        r.close()
+    os.rename(part, dest)
+    return received
+
+
+def encode_path(path):
+    """Encode a server path for use in a `/files/` endpoint."""
+    path = path.replace("//", "/").encode("utf-8")
+    return base64.b64encode(path, b"+-").decode("ascii").replace("=", "*")
+
+
+@contextlib.contextmanager
+def shared(conn, path):
+    """Share a file for the duration of the block; yield its share URL."""
+    share = conn._post("/shares", {"share": {"path": path, "expires": 0}})
+    share = share["share"]
+    try:
+        yield "/shared/" + share["id"]
+    finally:
+        try:
+            conn.files.remove_share(share["id"])
+        except Exception:
+            pass
+
+
+def remote_sha256(conn, path, progress=None):
+    """Return the SHA-256 hex digest of a file on the server.
+
+    The file is streamed through the hash without being stored.
+    """
+    digest = hashlib.sha256()
+    with shared(conn, path) as url:
+        r = conn._stream("GET", url, no_api=True,
+                         headers={"Accept-Encoding": "identity"})
+        try:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                if progress:
+                    progress.update(len(chunk))
+        finally:
+            r.close()
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def _reuse(progress):
+    yield progress
+
+
+def download(conn, path, dest, sha256=None, label="", progress=None):
+    """Download a file from the server to `dest`, streaming it to disk.
+
+    The file is shared for the duration of the download and fetched from
+    its share link in chunks of `CHUNK_SIZE`, so memory use does not grow
+    with its size. Data goes to `dest + ".part"` and is only moved to
+    `dest` when complete and, if an expected SHA-256 is given or sent by
+    the server, verified. An interrupted download is resumed with a Range
+    request the next time, provided the server still has the same file
+    (checked with If-Range when it sends an ETag or Last-Modified).
+
+    Progress is shown on its own line unless a shared `progress` is given.
+    Returns the size and the SHA-256 hex digest of the file.
+    """
+    part = dest + ".part"
+    state_path = part + ".json"
+    state = _read_state(state_path) if os.path.exists(part) else {}
+    offset = os.path.getsize(part) \
+        if state.get("path") == path and state.get("total") else 0
+    with shared(conn, path) as url:
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = "bytes={0}-".format(offset)
+            if state.get("validator"):
+                headers["If-Range"] = state["validator"]
+        r = conn._stream("GET", url, headers=headers, no_api=True)
+        try:
+            total, expected = _start(r, offset, state, part)
+            if r.status_code == 200:
+                offset = 0
+            if r.status_code != 416:
+                _write_state(state_path, {
+                    "path": path, "total": total,
+                    "validator": r.headers.get("ETag") or
+                    r.headers.get("Last-Modified")})
+            digest = file_sha256(part, offset) if offset \
+                else hashlib.sha256()
+            shown = _reuse(progress) if progress else \
+                Progress(total, offset, label)
+            with open(part, "ab" if offset else "wb") as f, shown as progress:
+                try:
+                    for chunk in _body(r):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        progress.update(len(chunk))
+                except requests.exceptions.RequestException as e:
+                    if total is None:
+                        raise CLIException(
+                            "Download interrupted: {0}".format(e))
+        finally:
+            r.close()
+    size = os.path.getsize(part)
+    if total is not None and size != total:
+        raise CLIException(
+            "Download interrupted at {0} of {1}; run the same command "
+            "again to resume".format(str_fsize(size), str_fsize(total)))
+    expected = sha256 or expected
+    if expected and expected.lower() != digest.hexdigest():
+        os.unlink(part)
+        os.unlink(state_path)
+        raise CLIException(
+            "Checksum mismatch for {0}: expected {1}, got {2}".format(
+                path, expected.lower(), digest.hexdigest()))
+    os.rename(part, dest)
+    if os.path.exists(state_path):
+        os.unlink(state_path)
+    return size, digest.hexdigest()
+
+
+def _body(r):
+    """Return an iterator over the file data in a download response."""
+    if r.status_code == 416:
+        return iter([])
+    return r.iter_content(CHUNK_SIZE)
+
+
+def _start(r, offset, state, part):
+    """Check the response to a download request.
+
+    Returns the total size of the file (if known) and the checksum sent
+    by the server (if any).
+    """
+    if r.status_code == 206:
+        start, total = _content_range(r)
+        if start != offset or total != state.get("total"):
+            os.unlink(part)
+            os.unlink(part + ".json")
+            raise CLIException(
+                "The file changed on the server since the download began; "
+                "run the same command again to start over")
+        return total, _server_sha256(r)
+    if r.status_code == 416 and offset == state.get("total"):
+        return offset, None
+    if r.status_code != 200:
+        raise CLIException(
+            "Unexpected response from the server ({0})".format(
+                r.status_code))
+    length = r.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None, \
+        _server_sha256(r)
+
+
+class MultipartFile(object):
+    """A `multipart/form-data` request body holding one local file.
+
+    The body is read by the HTTP library a block at a time, straight from
+    the file, and its length is known in advance so that it is sent with
+    a Content-Length rather than in chunks.
+    """
+
+    def __init__(self, path, field="file[0]", progress=None):
+        boundary = binascii.hexlify(os.urandom(16)).decode("ascii")
+        self.content_type = "multipart/form-data; boundary=" + boundary
+        head = (
+            '--{0}\r\nContent-Disposition: form-data; name="{1}"; '
+            'filename="{2}"\r\nContent-Type: application/octet-stream'
+            '\r\n\r\n').format(
+                boundary, field, os.path.basename(path)).encode("utf-8")
+        tail = "\r\n--{0}--\r\n".format(boundary).encode("ascii")
+        self.size = os.path.getsize(path)
+        self.length = len(head) + self.size + len(tail)
+        self.file = open(path, "rb")
+        self.head, self.tail = head, tail
+        self.progress = progress
+        self.sent = 0
+        self.rewind()
+
+    def __len__(self):
+        return self.length
+
+    def rewind(self):
+        """Start reading the body from the beginning again."""
+        self.file.seek(0)
+        self.parts = [io.BytesIO(self.head), self.file, io.BytesIO(self.tail)]
+        if self.progress:
+            self.progress.update(-self.sent)
+        self.sent = 0
+
+    def read(self, size=-1):
+        size = CHUNK_SIZE if size is None or size < 0 else size
+        data = b""
+        while self.parts and len(data) < size:
+            chunk = self.parts[0].read(size - len(data))
+            if not chunk:
+                self.parts.pop(0)
+                continue
+            if self.parts[0] is self.file:
+                self.sent += len(chunk)
+                if self.progress:
+                    self.progress.update(len(chunk))
+            data += chunk
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def upload(conn, path, remote_dir, retries=3, progress=None):
+    """Upload a local file into a folder on the server.
+
+    The file is streamed as the body of a single request, so memory use
+    does not grow with its size. The server has no way to take a file in
+    parts, so a failed upload is retried as a whole (with a growing
+    pause), up to `retries` times. Afterwards the size of the file on the
+    server is checked against the local one.
+
+    Returns the server's description of the uploaded file.
+    """
+    from pyarkosclient.errors import GeneralError, ServerError
+    remote = remote_dir.rstrip("/") + "/" + os.path.basename(path)
+    endpoint = "/files/" + encode_path(remote_dir.rstrip("/") or "/")
+    conn._get(endpoint)
+    for attempt in range(retries + 1):
+        body = MultipartFile(path, progress=progress)
+        try:
+            r = conn._stream(
+                "POST", endpoint, data=body,
+                headers={"Content-Type": body.content_type})
+            r.close()
+            break
+        except (GeneralError, ServerError,
+                requests.exceptions.RequestException):
+            body.rewind()
+            if attempt == retries:
+                raise
+            time.sleep(2 ** attempt)
+        finally:
+            body.close()
+    data = conn._get("/files/" + encode_path(remote)).get("file") or {}
+    if data.get("size") is not None and data["size"] != body.size:
+        raise CLIException(
+            "Upload of {0} is incomplete: {1} of {2} on the server".format(
+                path, str_fsize(data["size"]), str_fsize(body.size)))
+    return data
@@ -1,30 +1,215 @@
 # -*- coding: utf-8 -*-
 """Utility commands."""
 import click
+import copy
+import json
+import os
+import random
 import time
 
+from arkosctl import CLIException
 
-def handle_job(job):
-    """Check job result endpoints and display messages accordingly."""
-    msg = None
+
+class PollPolicy(object):
+    """Backoff schedule for polling the status of a job.
+
+    Polls start every `initial` seconds and grow by `factor` up to a cap of
+    `maximum` seconds, with up to `jitter` (as a fraction) of random spread.
+    A non-zero `timeout` bounds the total time spent waiting.
+    """
+
+    def __init__(self, initial=0.25, maximum=10.0, factor=1.5, jitter=0.1,
+                 timeout=0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.timeout = timeout
+
+    @classmethod
+    def from_context(cls):
+        """Build a policy from the options given to the main command."""
+        ctx = click.get_current_context(silent=True)
+        opts = (ctx.find_root().obj or {}).get("poll", {}) if ctx else {}
+        return cls(**opts)
+
+    def delays(self):
+        """Yield successive delays until the timeout is reached."""
+        delay = self.initial
+        deadline = time.time() + self.timeout if self.timeout else None
+        while True:
+            spread = delay * self.jitter
+            wait = max(0, delay + random.uniform(-spread, spread))
+            if deadline is not None:
+                if time.time() >= deadline:
+                    return
+                wait = min(wait, max(0, deadline - time.time()))
+            yield wait
+            delay = min(delay * self.factor, self.maximum)
+
+
+def format_job_message(message):
+    """Style a job status message according to its level."""
+    fg = None
+    if message["level"] == "success":
+        fg = "green"
+    elif message["level"] == "warning":
+        fg = "yellow"
+    elif message["level"] == "error":
+        fg = "red"
+    hd = click.style(message["title"] + " - ", fg=fg, bold=True)
+    hd = (hd if message["title"] != "None" else "")
+    return hd + click.style(message["message"], fg=fg)
+
+
+def no_wait_option(f):
+    """Add a `--no-wait` flag to a command that starts jobs.
+
+    The flag is kept on the command's own context, as `meta` and `obj` are
+    shared with every other command line run by the same shell or batch.
+    """
+    def callback(ctx, param, value):
+        ctx.arkosctl_no_wait = value
+    return click.option(
+        "--no-wait", is_flag=True, expose_value=False, callback=callback,
+        help="Print the job ID and return without waiting for the job")(f)
+
+
+def no_wait():
+    """Whether the current command was asked not to wait for its jobs."""
+    ctx = click.get_current_context(silent=True)
+    return bool(getattr(ctx, "arkosctl_no_wait", False))
+
+
+def detach_job(job, label=""):
+    """Record a job in the local journal and print its ID, if requested.
+
+    Returns True if the caller should not wait for the job.
+    """
+    if not no_wait():
+        return False
+    ctx = click.get_current_context()
+    if not label:
+        args = [ctx.params[x.name] for x in ctx.command.params
+                if isinstance(x, click.Argument)]
+        label = " ".join(
+            " ".join(x) if isinstance(x, tuple) else str(getattr(x, "name", x))
+            for x in args)
+    from arkosctl.journal import JobJournal
+    JobJournal().record(job.host, job.id, ctx.command_path, label)
+    click.echo(job.id)
+    return True
+
+
+def invalidate_listings(job):
+    """Drop cached listings that a job may have changed, once it succeeds.
+
+    Listings fetched while the job ran may otherwise be served until their
+    cached copies expire. For jobs not started by this process, which
+    endpoint they changed is unknown, so every listing of the host goes.
+    """
+    if job.status == "success":
+        from arkosctl.cache import ResponseCache
+        ResponseCache().invalidate(job.host, getattr(job, "endpoint", None))
+
+
+def _timed_out(job):
+    return CLIException(
+        "Timed out waiting for job {0}; it may still be running "
+        "on the server.".format(job.id))
+
+
+def _stream_job(job, deadline=None):
+    """Follow a job over a Server-Sent Events stream, if the server has one.
+
+    Each event carries a JSON job message; an event named after a final job
+    status (`success`, `error_request`, `error_server`) ends the job. If the
+    server answers with a plain status instead, it is used as a first poll.
+    The stream is left once the `deadline` (a timestamp) has passed.
+    """
+    import requests
+    timeout = 60
+    if deadline is not None:
+        timeout = max(0.001, min(timeout, deadline - time.time()))
+    try:
+        r = requests.get(
+            job.host + "/api/jobs/" + job.id, stream=True,
+            headers={"Accept": "text/event-stream"}, timeout=(10, timeout))
+    except requests.exceptions.RequestException:
+        return
+    try:
+        if not r.headers.get("Content-Type", "").startswith(
+                "text/event-stream"):
+            try:
+                job.message = r.json()
+            except ValueError:
+                pass
+            job._set_status(r.status_code)
+            yield
+            return
+        event, data = "message", []
+        for line in r.iter_lines(chunk_size=1, decode_unicode=True):
+            if deadline is not None and time.time() >= deadline:
+                return
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+            elif not line and data:
+                job.message = json.loads("\n".join(data))
+                if event in ["success", "error_request", "error_server"]:
+                    job.status = event
+                event, data = "message", []
+                yield
+                if job.status != "running":
+                    return
+    except (requests.exceptions.RequestException, ValueError):
+        pass
+    finally:
+        r.close()
+
+
+def watch_job(job, policy=None):
+    """Yield each time the status or message of a job may have changed.
+
+    Progress is pushed over a streaming channel when the server offers one;
+    otherwise, or if the stream ends early, the job is polled following the
+    backoff policy. The policy's timeout covers both.
+    """
+    policy = policy or PollPolicy.from_context()
+    deadline = time.time() + policy.timeout if policy.timeout else None
+    for _ in _stream_job(job, deadline):
+        yield
+    if job.status != "running":
+        return
+    if deadline is not None:
+        if time.time() >= deadline:
+            raise _timed_out(job)
+        policy = copy.copy(policy)
+        policy.timeout = deadline - time.time()
+    delays = policy.delays()
     while job.status == "running":
-        time.sleep(2)
+        try:
+            time.sleep(next(delays))
+        except StopIteration:
+            raise _timed_out(job)
         job.check()
-        if job.message and job.message != msg:
-            fg = None
-            if job.message["level"] == "success":
-                fg = "green"
-            elif job.message["level"] == "warning":
-                fg = "yellow"
-            elif job.message["level"] == "error":
-                fg = "red"
-            hd = click.style(job.message["title"] + " - ", fg=fg, bold=True)
-            hd = (hd if job.message["title"] != "None" else "")
-            click.echo(hd + click.style(job.message["message"], fg=fg))
+        yield
+
+
+def handle_job(job, policy=None, label="", echo=True):
+    """Check job result endpoints and display messages accordingly."""
+    if detach_job(job, label):
+        return
+    msg = None
+    for _ in watch_job(job, policy):
+        if job.message and job.message != msg and echo:
+            click.echo(format_job_message(job.message))
             msg = job.message
+    invalidate_listings(job)
     if job.status != "success":
         if job.message and job.message != msg:
-            raise CLIException(job.message)
+            raise CLIException(format_job_message(job.message))
         elif not job.message or (job.message and job.message != msg):
             raise CLIException(
                 "The process ended in error. Please check your server logs.")
@@ -32,6 +217,192 @@ def handle_job(job):
             raise CLIException("Unknown error")
 
 
+class JobManager(object):
+    """Start several jobs and track them together until all have finished.
+
+    Jobs are launched from a small thread pool and then polled in a single
+    loop, each on its own backoff schedule. On a terminal, one status line
+    per job is redrawn in place; otherwise each new message is printed
+    prefixed by the job's label.
+    """
+
+    def __init__(self, policy=None, workers=4):
+        self.policy = policy or PollPolicy.from_context()
+        self.workers = workers
+        self.entries = []
+
+    def launch(self, label, func, *args, **kwargs):
+        """Queue a call that returns a job (or a `(job, data)` tuple)."""
+        self.entries.append({
+            "label": label, "call": (func, args, kwargs), "job": None,
+            "status": "starting", "message": None, "error": None
+        })
+
+    def _start(self, entry):
+        func, args, kwargs = entry["call"]
+        try:
+            job = func(*args, **kwargs)
+        except Exception as e:
+            entry["status"], entry["error"] = "failed", str(e)
+            return
+        entry["job"] = job[0] if isinstance(job, tuple) else job
+        entry["status"] = "running"
+
+    def _finish(self, entry):
+        job = entry["job"]
+        if job.status == "success":
+            entry["status"] = "success"
+            invalidate_listings(job)
+            return
+        entry["status"] = "failed"
+        if job.message:
+            entry["error"] = job.message["message"]
+        else:
+            entry["error"] = "The process ended in error. " \
+                "Please check your server logs."
+
+    def _line(self, entry, width):
+        fg = {"success": "green", "failed": "red"}.get(entry["status"])
+        line = click.style(
+            "{0: <{1}}".format(entry["label"], width), fg="white", bold=True)
+        line += click.style("{0: <10}".format(entry["status"]), fg=fg)
+        if entry["error"]:
+            return line + click.style(entry["error"], fg="red")
+        if entry["message"]:
+            return line + format_job_message(entry["message"])
+        return line
+
+    def _render(self, redraw):
+        width = max(len(x["label"]) for x in self.entries) + 3
+        if redraw:
+            click.echo("\033[{0}A".format(len(self.entries)), nl=False)
+        for x in self.entries:
+            click.echo("\033[K" + self._line(x, width))
+
+    def _poll(self, entry, tty):
+        job = entry["job"]
+        try:
+            job.check()
+        except Exception as e:
+            entry["status"], entry["error"] = "failed", str(e)
+            if not tty:
+                click.echo(self._line(entry, len(entry["label"]) + 3))
+            return
+        if job.message and job.message != entry["message"]:
+            entry["message"] = job.message
+            if not tty:
+                click.echo("{0}: {1}".format(
+                    entry["label"], format_job_message(job.message)))
+        if job.status != "running":
+            self._finish(entry)
+        else:
+            wait = next(entry["delays"], None)
+            if wait is not None:
+                entry["next"] = time.time() + wait
+                return
+            entry["status"] = "timeout"
+            entry["error"] = "Timed out; it may still be running on the server"
+        if not tty:
+            click.echo(self._line(entry, len(entry["label"]) + 3))
+
+    def wait(self):
+        """Run all queued jobs and return the number that did not succeed."""
+        if not self.entries:
+            return 0
+        detached = no_wait()
+        tty = click.get_text_stream("stdout").isatty() and not detached
+        if tty:
+            self._render(False)
+        for _ in run_parallel(self._start, self.entries, self.workers):
+            pass
+        if detached:
+            for x in self.entries:
+                if x["job"]:
+                    detach_job(x["job"], x["label"])
+                else:
+                    click.echo(self._line(x, len(x["label"]) + 3), err=True)
+            return len([x for x in self.entries if not x["job"]])
+        for x in self.entries:
+            if x["status"] == "running":
+                x["delays"] = self.policy.delays()
+                x["next"] = time.time() + next(x["delays"], 0)
+            elif not tty:
+                click.echo(self._line(x, len(x["label"]) + 3))
+        if tty:
+            self._render(True)
+        running = [x for x in self.entries if x["status"] == "running"]
+        while running:
+            time.sleep(max(0, min(x["next"] for x in running) - time.time()))
+            for x in running:
+                if x["next"] <= time.time():
+                    self._poll(x, tty)
+            running = [x for x in running if x["status"] == "running"]
+            if tty:
+                self._render(True)
+        return len([x for x in self.entries if x["status"] != "success"])
+
+
+def handle_jobs(jobs):
+    """Run the jobs queued in a JobManager, failing if any of them did.
+
+    A single job is handled exactly as by `handle_job()`.
+    """
+    if len(jobs.entries) == 1:
+        entry = jobs.entries[0]
+        func, args, kwargs = entry["call"]
+        job = func(*args, **kwargs)
+        handle_job(job[0] if isinstance(job, tuple) else job, jobs.policy,
+                   entry["label"])
+        return
+    failed = jobs.wait()
+    if failed:
+        raise CLIException("{0} of {1} jobs did not succeed".format(
+            failed, len(jobs.entries)))
+
+
+def run_parallel(func, items, workers, stop=None):
+    """Call `func` on each item from a pool of `workers` threads.
+
+    Items are taken from `items` only as threads become free, and
+    `(item, result, error)` is yielded as each call finishes, `error`
+    being the exception it raised, if any. No more items are started once
+    `stop()` returns true. The pool is shut down however iteration ends.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, \
+        FIRST_COMPLETED
+    items = iter(items)
+    pending = {}
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            while len(pending) < workers and not (stop and stop()):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                pending[pool.submit(func, item)] = item
+            if not pending:
+                return
+            for future in wait(pending, return_when=FIRST_COMPLETED)[0]:
+                item = pending.pop(future)
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                yield item, result, error
+    finally:
+        pool.shutdown()
+
+
+def invoke_line(ctx, args):
+    """Invoke a command line in the tree of `ctx`, sharing its client."""
+    root = ctx.find_root()
+    cmd_name, cmd, args = root.command.resolve_command(root, args)
+    sub_ctx = cmd.make_context(cmd_name, args, parent=root)
+    with sub_ctx:
+        return cmd.invoke(sub_ctx)
+
+
 def abort_if_false(ctx, param, value):
     """Abort the command if the value resolves to be false."""
     if not value:
@@ -50,3 +421,40 @@ def str_fsize(sz):
         return "%.1f Mb" % sz
     sz /= 1024.0
     return "%.1f Gb" % sz
+
+
+class _NoProgress(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, n):
+        pass
+
+
+def progress_bar(length, label=""):
+    """Return a progress bar on stderr, or a silent one if not a terminal.
+
+    Use it as a context manager and call `update(n)` as work is done.
+    """
+    stream = click.get_text_stream("stderr")
+    if not stream.isatty():
+        return _NoProgress()
+    return click.progressbar(length=length, label=label, file=stream)
+
+
+def cache_path(*parts):
+    """Return a path under the arkosctl cache directory, creating it."""
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "arkosctl")
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path, 0o700)
+        except OSError:
+            # Another process (e.g. another host of --hosts) made it first.
+            if not os.path.isdir(path):
+                raise
+    return os.path.join(path, *parts)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""Time the text tables of list commands on a large number of rows.
+
+Each listing is run against an in-memory stand-in for the server, so only
+the time spent building and writing the table is measured. Every run is
+a separate process with stdout sent to a file and then to a terminal
+(a pseudo-terminal, where tables are styled). The median of the runs is
+shown in milliseconds, or `-` where the command failed.
+
+    python benchmarks/tables.py [--rows 10000] [--runs 5] [TREE...]
+
+Each TREE is the root of an arkosctl checkout (default: this one). To
+compare with an older version:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/tables.py /tmp/before .
+"""
+import datetime
+import os
+import pty
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import click
+
+COMMANDS = ["svc list", "db list", "cert list", "app list", "key list"]
+
+
+def _rows(n):
+    now = datetime.datetime.now()
+    return {
+        "services": [
+            {"id": "svc{0}".format(i),
+             "state": "running" if i % 2 else "stopped",
+             "enabled": bool(i % 3)} for i in range(n)],
+        "databases": [
+            {"id": "db{0}".format(i), "database_type": "mariadb"}
+            for i in range(n)],
+        "certificates": [
+            {"id": "cert{0}".format(i), "keylength": 2048, "keytype": "RSA",
+             "domain": "d{0}.example.com".format(i), "expiry": now}
+            for i in range(n)],
+        "apps": [
+            {"name": "app{0}".format(i), "version": "1.{0}".format(i),
+             "description": {"short": "An app"}} for i in range(n)],
+        "apikeys": [
+            {"key": "k" * 40, "user": "user{0}".format(i), "comment": "c"}
+            for i in range(n)]
+    }
+
+
+def run_once(tree, command, n):
+    """Run one listing from the checkout at `tree`; return its seconds."""
+    sys.path.insert(0, tree)
+    import arkosctl
+    from arkosctl.frameworks import (apikeys, applications, certificates,
+                                     databases, services)
+    data = _rows(n)
+
+    class Client(object):
+        class services(object):
+            get = staticmethod(lambda: data["services"])
+
+        class databases(object):
+            get = staticmethod(lambda: data["databases"])
+            get_types = staticmethod(
+                lambda: [{"id": "mariadb", "name": "MariaDB"}])
+
+        class certificates(object):
+            get = staticmethod(lambda: data["certificates"])
+
+        class apikeys(object):
+            get = staticmethod(lambda: data["apikeys"])
+
+    for module in (services, databases, certificates, apikeys):
+        module.client = lambda: Client
+    # The pager would wait for a key press.
+    click.echo_via_pager = click.echo
+    func = {
+        "svc list": services.list_services.callback,
+        "db list": databases.list_dbs.callback,
+        "cert list": certificates.list_certs.callback,
+        "app list": lambda: applications._list_applications(data["apps"]),
+        "key list": apikeys.list_keys.callback
+    }[command]
+    with click.Context(arkosctl.main, obj={"output": "text"}):
+        start = time.time()
+        func()
+        return time.time() - start
+
+
+def _drain(fd):
+    try:
+        while os.read(fd, 65536):
+            pass
+    except OSError:
+        pass
+
+
+def _measure(tree, command, n, tty):
+    """Run a listing in a new process; return its seconds or None."""
+    args = [sys.executable, os.path.abspath(__file__), "--child", tree,
+            command, str(n)]
+    if tty:
+        master, slave = pty.openpty()
+        reader = threading.Thread(target=_drain, args=(master,))
+        reader.daemon = True
+        reader.start()
+        proc = subprocess.Popen(args, stdout=slave, stderr=subprocess.PIPE)
+        os.close(slave)
+        err = proc.communicate()[1]
+        reader.join(5)
+        os.close(master)
+    else:
+        with tempfile.TemporaryFile() as out:
+            proc = subprocess.Popen(args, stdout=out, stderr=subprocess.PIPE)
+            err = proc.communicate()[1]
+    lines = err.decode("utf-8", "replace").strip().splitlines()
+    if proc.returncode or not lines:
+        return None
+    try:
+        return float(lines[-1])
+    except ValueError:
+        return None
+
+
+def _median(values):
+    if None in values:
+        return None
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+@click.command()
+@click.argument("trees", nargs=-1, type=click.Path(exists=True))
+@click.option("--rows", type=click.IntRange(1), default=10000,
+              help="Number of rows in each listing")
+@click.option("--runs", type=click.IntRange(1), default=5,
+              help="Number of runs to take the median of")
+def main(trees, rows, runs):
+    """Time the list commands of each TREE on ROWS rows."""
+    trees = [os.path.abspath(x) for x in trees] or \
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    names = [os.path.basename(x) or x for x in trees]
+    width = max(len(x) for x in names) + 2
+    click.echo("{0} rows, median of {1} runs, in ms".format(rows, runs))
+    for label, tty in (("stdout to a file", False),
+                       ("stdout to a terminal", True)):
+        click.echo("\n" + label)
+        click.echo(" " * 12 + "".join(x.rjust(width) for x in names))
+        for command in COMMANDS:
+            cells = []
+            for tree in trees:
+                secs = _median([_measure(tree, command, rows, tty)
+                                for _ in range(runs)])
+                cells.append("-" if secs is None else
+                             "{0:.0f}".format(secs * 1000))
+            click.echo(command.ljust(12) +
+                       "".join(x.rjust(width) for x in cells))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        tree, command, n = sys.argv[2:5]
+        secs = run_once(tree, command, int(n))
+        sys.stderr.write("{0:.6f}\n".format(secs))
+    else:
+        main()
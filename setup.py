@@ -8,8 +8,12 @@ setup(
     version="0.3",
     install_requires=[
         "click==6.0",
+        "futures; python_version < '3.0'",
         "pyarkosclient>=0.3"
     ],
+    extras_require={
+        "zstd": ["zstandard"]
+    },
     description="arkOS command-line interface",
     author='CitizenWeb',
     author_email='info@citizenweb.io',
@@ -17,6 +21,6 @@ setup(
     license='GPLv3',
     packages=find_packages(),
     entry_points={
-        'console_scripts': ['arkosctl = arkosctl:main'],
+        'console_scripts': ['arkosctl = arkosctl:run'],
     }
 )
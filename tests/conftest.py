@@ -0,0 +1,135 @@
+"""Shared fixtures: an isolated environment and a stand-in arkOS server."""
+import json
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+try:
+    # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    # Python 3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer requests from the routes of the stand-in server."""
+
+    protocol_version = "HTTP/1.1"
+    # Give up on clients that announce a body they never send.
+    timeout = 5
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body=None, headers=None):
+        """Send a JSON response."""
+        data = json.dumps(body if body is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        size = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(size) if size else b""
+        path = self.path.split("?")[0]
+        self.server.stub.requests.append((self.command, path, body))
+        route = self.server.stub.routes.get((self.command, path)) or \
+            self.server.stub.fallback
+        if route is None:
+            self.send_json(404)
+        elif callable(route):
+            route(self, body)
+        else:
+            self.send_json(*route)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+
+class Runner(CliRunner):
+    """Invoke commands under the name they are installed as."""
+
+    def get_default_prog_name(self, cli):
+        return "arkosctl"
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubServer(object):
+    """A local stand-in for an arkOS server.
+
+    `routes` maps `(method, path)` to a `(status, body)` tuple or to a
+    function called with the request handler and the request body.
+    Requests that match no route go to `fallback`, a function like those
+    of `routes`, if set. Every request received is recorded in `requests`
+    as `(method, path, body)`; logins and pings are answered by default.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.fallback = None
+        self.routes = {
+            ("POST", "/api/token"): (200, {"token": "token"}),
+            ("GET", "/api/ping"): (200, {})
+        }
+        self.httpd = _Server(("127.0.0.1", 0), StubHandler)
+        self.httpd.stub = self
+        self.url = "http://127.0.0.1:{0}".format(self.httpd.server_port)
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def paths(self, method=None):
+        """Return the paths requested so far, except logins."""
+        return [p for m, p, _ in self.requests
+                if p != "/api/token" and method in (None, m)]
+
+    def close(self):
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Keep every test away from the user's settings, caches and agent."""
+    import os
+    from arkosctl import connection
+    for k in list(os.environ):
+        if k.startswith("ARKOS_CLI_"):
+            monkeypatch.delenv(k)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("ARKOS_CLI_NO_AGENT", "1")
+    monkeypatch.setattr(connection, "_clients", {})
+    return tmp_path
+
+
+@pytest.fixture
+def server():
+    """A running stand-in server."""
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def cli(server):
+    """Invoke arkosctl against the stand-in server; return the result."""
+    from arkosctl import main
+
+    def invoke(*args, **kwargs):
+        args = ["--host", server.url, "--user", "admin",
+                "--password", "secret"] + list(args)
+        return Runner().invoke(main, args, **kwargs)
+    return invoke
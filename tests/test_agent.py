@@ -0,0 +1,97 @@
+"""Forwarding command lines to a local agent."""
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from arkosctl.agent import AgentServer, forward, forwardable, run_command
+
+
+@pytest.fixture
+def agent(tmp_path, server, monkeypatch):
+    """An agent listening on a socket, with credentials for the server."""
+    monkeypatch.setenv("ARKOS_CLI_HOST", server.url)
+    monkeypatch.setenv("ARKOS_CLI_USER", "admin")
+    monkeypatch.setenv("ARKOS_CLI_PASS", "secret")
+    path = str(tmp_path / "agent.sock")
+    httpd = AgentServer(path)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,))
+    thread.daemon = True
+    thread.start()
+    yield path
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _send(path, args):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    with sock:
+        sock.sendall(json.dumps({"args": args}).encode("utf-8") + b"\n")
+        return json.loads(sock.makefile("rb").readline().decode("utf-8"))
+
+
+@pytest.mark.parametrize("args, expected", [
+    (["svc", "status", "nginx"], True),
+    (["-o", "json", "svc", "list"], True),
+    (["svc", "list", "--help"], False),
+    (["-o", "ndjson", "svc", "list"], False),
+    (["--hosts", "web", "svc", "list"], False),
+    (["db", "load", "mydb", "dump.sql"], False),
+    (["user", "add", "bob", "Bob"], False),
+    (["batch", "-"], False)
+])
+def test_forwardable(args, expected):
+    assert forwardable(args) is expected
+
+
+def test_forwards_listing(agent, server, capsys):
+    server.routes[("GET", "/api/system/services")] = (200, {"services": [
+        {"id": "nginx", "state": "running", "enabled": True}
+    ]})
+    assert forward(["svc", "list"], agent) == 0
+    assert "nginx" in capsys.readouterr().out
+
+
+def test_refuses_other_commands(agent, server):
+    resp = _send(agent, ["db", "load", "mydb", "dump.sql"])
+    assert resp["exit_code"] == 2
+    assert server.requests == []
+
+
+def test_no_agent_listening(tmp_path):
+    assert forward(["svc", "list"], str(tmp_path / "none.sock")) is None
+
+
+def test_runs_in_caller_directory(tmp_path, server):
+    server.routes[("PUT", "/api/databases/mydb")] = (200, {"result": ""})
+    (tmp_path / "rel.sql").write_text(u"SELECT 1;\n")
+    env = {"ARKOS_CLI_HOST": server.url, "ARKOS_CLI_USER": "admin",
+           "ARKOS_CLI_PASS": "secret"}
+    cwd = os.getcwd()
+    code, out, err = run_command(
+        ["db", "load", "mydb", "rel.sql"], env, cwd=str(tmp_path))
+    assert code == 0, err
+    assert os.getcwd() == cwd
+    assert server.paths("PUT") == ["/api/databases/mydb"]
+
+
+def test_callers_do_not_share_settings(server, monkeypatch):
+    server.routes[("GET", "/api/system/services")] = (200, {"services": [
+        {"id": "nginx", "state": "running", "enabled": True}
+    ]})
+    monkeypatch.setenv("ARKOS_CLI_HOST", "http://127.0.0.1:9")
+    monkeypatch.setenv("ARKOS_CLI_OUTPUT", "csv")
+    env = {"ARKOS_CLI_HOST": server.url, "ARKOS_CLI_USER": "admin",
+           "ARKOS_CLI_PASS": "secret"}
+    code, out, err = run_command(
+        ["svc", "list"], dict(env, ARKOS_CLI_OUTPUT="json"))
+    assert code == 0, err
+    assert json.loads(out.decode("utf-8"))[0]["id"] == "nginx"
+    code, out, err = run_command(["svc", "list"], env)
+    assert code == 0, err
+    assert out.decode("utf-8").split()[0] == "nginx"
+    assert os.environ["ARKOS_CLI_HOST"] == "http://127.0.0.1:9"
+    assert os.environ["ARKOS_CLI_OUTPUT"] == "csv"
@@ -0,0 +1,99 @@
+"""Authentication of API clients."""
+import os
+
+import pytest
+
+from arkosctl.api import Client
+from arkosctl.sessions import SessionCache
+from arkosctl.utils import run_parallel
+from pyarkosclient.errors import AuthenticationError
+
+
+def _tokens(server, tokens):
+    """Hand out a new token per login; only the latest one is accepted."""
+    issued = []
+
+    def login(handler, body):
+        issued.append(tokens.pop(0))
+        handler.send_json(200, {"token": issued[-1]})
+
+    def services(handler, body):
+        auth = handler.headers.get("Authorization")
+        if not issued or auth != "Bearer " + issued[-1]:
+            return handler.send_json(401)
+        handler.send_json(200, {"services": []})
+    server.routes[("POST", "/api/token")] = login
+    server.routes[("GET", "/api/system/services")] = services
+    return issued
+
+
+def test_logs_in_again_when_token_expires(server):
+    issued = _tokens(server, ["t1", "t2"])
+    conn = Client(server.url, "admin", "secret")
+    assert conn.services.get() == []
+    issued.append("expired")
+    assert conn.services.get() == []
+    assert issued == ["t1", "expired", "t2"]
+    assert conn.token == "t2"
+
+
+def test_replaces_rejected_cached_token(server, tmp_path):
+    _tokens(server, ["t2"])
+    sessions = SessionCache(str(tmp_path / "sessions.json"))
+    sessions.set(server.url, "admin", "stale")
+    conn = Client(server.url, "admin", "secret", sessions=sessions)
+    assert conn.services.get() == []
+    assert sessions.get(server.url, "admin") == "t2"
+
+
+def test_does_not_retry_api_keys(server):
+    server.routes[("GET", "/api/system/services")] = (401, {})
+    conn = Client(server.url, api_key="key")
+    with pytest.raises(AuthenticationError):
+        conn.services.get()
+    assert server.paths() == ["/api/ping", "/api/system/services"]
+
+
+def test_parallel_rejections_share_one_login(server):
+    issued = _tokens(server, ["t{0}".format(x) for x in range(10)])
+    conn = Client(server.url, "admin", "secret")
+    issued.append("expired")
+    results = list(run_parallel(lambda x: conn.services.get(), range(8), 8))
+    assert [x[2] for x in results] == [None] * 8
+    assert issued == ["t0", "expired", "t1"]
+
+
+def test_session_cache_shared_by_threads(tmp_path):
+    sessions = SessionCache(str(tmp_path / "sessions.json"))
+
+    def save(x):
+        for i in range(50):
+            sessions.set("http://host{0}".format(x), "admin", str(i))
+    results = list(run_parallel(save, range(8), 8))
+    assert [x[2] for x in results] == [None] * 8
+    assert [sessions.get("http://host{0}".format(x), "admin")
+            for x in range(8)] == ["49"] * 8
+    assert os.listdir(str(tmp_path)) == ["sessions.json"]
+
+
+def test_streamed_body_sent_again_after_login(server, tmp_path):
+    from arkosctl import transfers
+    issued = _tokens(server, ["t1", "t2"])
+    folder = "/api/files/" + transfers.encode_path("/srv")
+    bodies = []
+
+    def post(handler, body):
+        bodies.append(body)
+        if handler.headers.get("Authorization") != "Bearer t2":
+            return handler.send_json(401)
+        handler.send_json(201, {})
+    server.routes[("GET", folder)] = (200, {"file": {"path": "/srv"}})
+    server.routes[("POST", folder)] = post
+    server.routes[("GET", "/api/files/" + transfers.encode_path(
+        "/srv/data.bin"))] = (200, {"file": {"size": 4096}})
+    (tmp_path / "data.bin").write_bytes(b"x" * 4096)
+    conn = Client(server.url, "admin", "secret")
+    issued.append("expired")
+    transfers.upload(conn, str(tmp_path / "data.bin"), "/srv")
+    assert len(bodies) == 2
+    assert bodies[1] == bodies[0] and b"x" * 4096 in bodies[1]
@@ -0,0 +1,82 @@
+"""Backup commands."""
+import json
+
+import pytest
+
+from arkosctl import CLIException, transfers
+from arkosctl.frameworks import backups
+
+
+@pytest.mark.parametrize("name, app", [
+    ("nginx-20160130-120000.tar.gz", "nginx"),
+    ("my-site-20160130-120000.tar.gz", "my-site"),
+    ("site-2-20160130-120000.tar.gz", "site-2")
+])
+def test_app_from_file_name(isolated, name, app):
+    (isolated / name).write_bytes(b"")
+    assert backups._backup_app(str(isolated / name)) == app
+
+
+def test_app_from_metadata(isolated):
+    (isolated / "renamed.tar.gz").write_bytes(b"")
+    (isolated / "renamed.meta").write_text(
+        u'{"pid": "my-site", "type": "site"}')
+    assert backups._backup_app(str(isolated / "renamed.tar.gz")) == "my-site"
+
+
+def test_app_unknown(isolated):
+    (isolated / "renamed.tar.gz").write_bytes(b"")
+    with pytest.raises(CLIException):
+        backups._backup_app(str(isolated / "renamed.tar.gz"))
+
+
+def _import_routes(server, name, exists=True):
+    """Answer an upload of `name` into the my-site folder of backups."""
+    folder = backups.BACKUP_DIR + "/my-site"
+    root = "/api/files/" + transfers.encode_path(backups.BACKUP_DIR)
+    endpoint = "/api/files/" + transfers.encode_path(folder)
+    made = [exists]
+
+    def make(handler, body):
+        made[0] = True
+        handler.send_json(201, {"file": {"path": folder}})
+
+    def get(handler, body):
+        if made[0]:
+            handler.send_json(200, {"file": {"path": folder}})
+        else:
+            handler.send_json(404)
+    server.routes[("GET", root)] = (200, {"file": {"path": root}})
+    server.routes[("POST", root)] = make
+    server.routes[("GET", endpoint)] = get
+    server.routes[("POST", endpoint)] = (201, {})
+    server.routes[("GET", "/api/files/" + transfers.encode_path(
+        folder + "/" + name))] = (200, {"file": {"size": 7}})
+    return root, endpoint
+
+
+def test_import_into_app_folder(cli, server, isolated):
+    name = "my-site-20160130-120000.tar.gz"
+    (isolated / name).write_bytes(b"archive")
+    root, endpoint = _import_routes(server, name)
+    result = cli("backup", "import", str(isolated / name))
+    assert result.exit_code == 0, result.output
+    assert server.paths("POST") == [endpoint]
+
+
+def test_import_into_missing_folder(cli, server, isolated):
+    name = "my-site-20160130-120000.tar.gz"
+    (isolated / name).write_bytes(b"archive")
+    root, endpoint = _import_routes(server, name, exists=False)
+    result = cli("backup", "import", str(isolated / name))
+    assert result.exit_code == 0, result.output
+    assert server.paths("POST") == [root, endpoint]
+    made = [b for m, p, b in server.requests if (m, p) == ("POST", root)]
+    assert json.loads(made[0].decode("utf-8")) == \
+        {"file": {"folder": True, "name": "my-site"}}
+
+
+def test_meta_path_ignores_folders(isolated):
+    path = str(isolated / "x.tar.d" / "nginx-20160130-120000.tar.gz")
+    assert backups._meta_path(path) == \
+        str(isolated / "x.tar.d" / "nginx-20160130-120000.meta")
@@ -0,0 +1,28 @@
+"""Running scripts of command lines."""
+import pytest
+
+
+@pytest.fixture
+def script(tmp_path, server):
+    server.routes[("POST", "/api/system/shutdown")] = (500, {})
+    server.routes[("GET", "/api/system/services")] = (200, {"services": [
+        {"id": "nginx", "state": "running", "enabled": True}]})
+    path = tmp_path / "script"
+    path.write_text(u"# Comment\nsys shutdown\n\nsvc list\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("parallel", ["1", "2"])
+def test_keep_going_after_any_error(cli, server, script, parallel):
+    result = cli("batch", script, "--keep-going", "--parallel", parallel)
+    assert result.exit_code == 1
+    assert "HTTP 500" in result.output
+    assert "nginx" in result.output
+    assert "1 of 2 lines failed" in result.output
+
+
+def test_stop_on_any_error(cli, server, script):
+    result = cli("batch", script)
+    assert result.exit_code == 1
+    assert "skipped" in result.output
+    assert "/api/system/services" not in server.paths()
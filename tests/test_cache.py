@@ -0,0 +1,87 @@
+"""Caching of read-only listings."""
+import threading
+
+from pyarkosclient import Job
+
+from arkosctl.cache import NameIndex, ResponseCache
+from arkosctl.utils import handle_job, PollPolicy
+
+HOST = "http://stub"
+
+
+def test_concurrent_writers(tmp_path):
+    cache = ResponseCache(str(tmp_path), size=4)
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(100):
+                cache.set(HOST, "/apps", {"page": i % (n + 2)}, [n, i])
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=write, args=(x,)) for x in range(4)]
+    for x in threads:
+        x.start()
+    for x in threads:
+        x.join()
+    assert errors == []
+    assert len(list(tmp_path.glob("*.json"))) <= 4
+    assert [x for x in tmp_path.iterdir() if x.suffix != ".json"] == []
+
+
+def test_concurrent_name_updates(tmp_path):
+    index = NameIndex(HOST, str(tmp_path / "names.json"))
+    errors = []
+
+    def update(n):
+        try:
+            for i in range(50):
+                index.update("users", {"u{0}-{1}".format(n, i): i})
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=update, args=(x,)) for x in range(8)]
+    for x in threads:
+        x.start()
+    for x in threads:
+        x.join()
+    assert errors == []
+    assert all(index.get("users", "u{0}-{1}".format(n, i)) == i
+               for n in range(8) for i in range(50))
+    assert [x.name for x in tmp_path.iterdir()] == ["names.json"]
+
+
+def test_failed_write_is_ignored(tmp_path):
+    path = tmp_path / "file"
+    path.write_text(u"")
+    ResponseCache(str(path)).set(HOST, "/apps", None, [])
+
+
+def test_listing_refreshed_after_job(cli, server):
+    apps = [{"id": "foo", "name": "foo", "version": "1", "type": "app",
+             "description": {"short": "Foo"}, "installed": False}]
+    server.routes[("GET", "/api/apps")] = \
+        lambda handler, body: handler.send_json(200, {"apps": apps})
+    server.routes[("PUT", "/api/apps/foo")] = (
+        202, {"app": apps[0]}, {"Location": "/api/jobs/J1"})
+
+    def job(handler, body):
+        # The listing is fetched again while the job is running.
+        assert cli("app", "list").exit_code == 0
+        apps[0] = dict(apps[0], version="2")
+        handler.send_json(201, {"level": "success", "title": "None",
+                                "message": "Installed"})
+    server.routes[("GET", "/api/jobs/J1")] = job
+    assert cli("app", "install", "foo").exit_code == 0
+    result = cli("app", "list")
+    assert "2" in result.output.split()
+    assert server.paths().count("/api/apps") == 2
+
+
+def test_jobs_from_journal_drop_all_listings(tmp_path, server):
+    cache = ResponseCache()
+    cache.set(server.url, "/apps", None, [])
+    cache.set(server.url, "/websites", None, [])
+    server.routes[("GET", "/api/jobs/J1")] = (201, {})
+    handle_job(Job(server.url, "J1"), PollPolicy(), echo=False)
+    assert cache.get(server.url, "/apps") is None
+    assert cache.get(server.url, "/websites") is None
@@ -0,0 +1,81 @@
+"""Shell completion of commands and resource IDs."""
+import os
+import subprocess
+
+import pytest
+
+from arkosctl import main
+from arkosctl.frameworks.completion import _bash_script, _value_options, \
+    index_path
+
+
+def test_refresh_indexes_per_host(cli, server):
+    server.routes[("GET", "/api/system/services")] = (200, {"services": [
+        {"id": "nginx", "state": "running", "enabled": True}]})
+    result = cli("completion", "refresh")
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(index_path(server.url), "services")) as f:
+        assert f.read() == "nginx\n"
+    assert index_path("http://a:80") != index_path("http://b:80")
+
+
+def _index(host, services):
+    path = index_path(host)
+    os.makedirs(path)
+    with open(os.path.join(path, "services"), "w") as f:
+        f.write("\n".join(services) + "\n")
+
+
+def _complete(script, words, env=None):
+    line = " ".join(words)
+    cmd = "\n".join([
+        script,
+        "COMP_WORDS=({0})".format(line),
+        "COMP_CWORD={0}".format(len(words) - 1),
+        "_arkosctl_complete",
+        'echo "${COMPREPLY[@]}"'
+    ])
+    return subprocess.check_output(
+        ["bash", "-c", cmd], env=dict(os.environ, **(env or {})),
+        universal_newlines=True).split()
+
+
+@pytest.mark.skipif(
+    not any(os.path.exists(os.path.join(x, "bash"))
+            for x in os.environ.get("PATH", "").split(os.pathsep)),
+    reason="bash is not installed")
+def test_bash_completion():
+    _index("http://one", ["nginx", "php-fpm"])
+    _index("http://two", ["redis"])
+    script = _bash_script()
+    assert _complete(script, ["arkosctl", "--hosts", "web", "s"]) == \
+        ["sec", "shell", "sites", "svc", "sys"]
+    assert _complete(script, ["arkosctl", "-o", "json", "svc", "re"]) == \
+        ["restart"]
+    assert _complete(script, ["arkosctl", "--host", "http://one", "svc",
+                              "restart", ""]) == ["nginx", "php-fpm"]
+    assert _complete(script, ["arkosctl", "svc", "restart", ""],
+                     {"ARKOS_CLI_HOST": "http://two"}) == ["redis"]
+
+
+def test_value_options_follow_main_options():
+    options = _value_options()
+    for param in main.params:
+        if not param.is_flag:
+            assert set(param.opts) <= set(options)
+    assert "--no-cache" not in options and "-v" not in options
+
+
+def test_backup_ids_are_accepted_by_restore(cli, server):
+    server.routes[("GET", "/api/backups")] = (200, {"backups": [
+        {"pid": "my-site", "time": "20160130-120000", "type": "site"}]})
+    result = cli("completion", "refresh")
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(index_path(server.url), "backups")) as f:
+        ids = f.read().split()
+    assert ids == ["my-site/20160130-120000"]
+    server.routes[("PUT", "/api/backups/my-site/20160130-120000")] = (
+        202, {"backup": {}}, {"Location": "/api/jobs/J1"})
+    result = cli("backup", "restore", ids[0], "--no-wait")
+    assert result.exit_code == 0, result.output
+    assert server.paths("PUT") == ["/api/backups/my-site/20160130-120000"]
@@ -0,0 +1,40 @@
+"""Invocations only connect to the server when a command needs it."""
+import pytest
+
+from arkosctl import FRAMEWORKS
+
+
+@pytest.mark.parametrize("args", [
+    ["--help"],
+    ["svc", "--help"],
+    ["svc", "start", "--help"],
+    ["db", "dump", "--help"]
+] + [[x, "--help"] for x in sorted(FRAMEWORKS)])
+def test_help_makes_no_requests(cli, server, args):
+    result = cli(*args)
+    assert result.exit_code == 0, result.output
+    assert server.requests == []
+
+
+def test_missing_argument_makes_no_requests(cli, server):
+    result = cli("svc", "start")
+    assert result.exit_code == 2
+    assert "Missing argument" in result.output
+    assert server.requests == []
+
+
+def test_unknown_command_makes_no_requests(cli, server):
+    result = cli("svc", "frobnicate")
+    assert result.exit_code == 2
+    assert server.requests == []
+
+
+def test_connects_on_first_use(cli, server):
+    server.routes[("GET", "/api/system/services")] = (200, {"services": [
+        {"id": "nginx", "state": "running", "enabled": True}
+    ]})
+    result = cli("svc", "list")
+    assert result.exit_code == 0, result.output
+    assert "nginx" in result.output
+    assert [x[1] for x in server.requests] == \
+        ["/api/token", "/api/system/services"]
@@ -0,0 +1,124 @@
+"""Database commands."""
+import os
+import zlib
+
+import pytest
+
+from arkosctl.frameworks import databases
+
+
+def _catalogue(server, rows):
+    server.routes[("GET", "/api/database_types")] = (200, {
+        "database_types": [{"id": "mariadb", "name": "MariaDB",
+                            "state": True}]})
+    server.routes[("GET", "/api/databases")] = (200, {"databases": [
+        {"id": "db{0}".format(x), "database_type": "mariadb"}
+        for x in range(rows)]})
+    server.routes[("GET", "/api/database_users")] = (200, {
+        "database_users": [{"id": "user{0}".format(x),
+                            "database_type": "mariadb"}
+                           for x in range(rows)]})
+
+
+@pytest.mark.parametrize("command", ["db", "dbuser"])
+def test_listing_requests_do_not_grow_with_rows(cli, server, command):
+    counts = []
+    for rows in (1, 10, 200):
+        _catalogue(server, rows)
+        del server.requests[:]
+        result = cli("--no-cache", command, "list")
+        assert result.exit_code == 0, result.output
+        assert len(result.output.splitlines()) == rows
+        counts.append(len(server.paths()))
+    assert counts == [2, 2, 2]
+
+
+def _dump_route(server, name, data):
+    def send(handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/sql")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+    server.routes[("GET", "/api/databases/" + name)] = send
+
+
+def test_dump_to_stdout(cli, server, isolated, monkeypatch):
+    _dump_route(server, "mydb", b"CREATE TABLE t (a int);\n")
+    monkeypatch.chdir(isolated)
+    result = cli("db", "dump", "mydb", "-")
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("CREATE TABLE t (a int);\n")
+    assert not os.path.exists("-") and not os.path.exists("-.part")
+
+
+def test_dump_to_stdout_compressed(cli, server, isolated, monkeypatch):
+    _dump_route(server, "mydb", b"CREATE TABLE t (a int);\n")
+    monkeypatch.chdir(isolated)
+    result = cli("db", "dump", "mydb", "-", "--compress", "gzip")
+    assert result.exit_code == 0, result.output
+    data = zlib.decompressobj(31).decompress(result.output_bytes)
+    assert data == b"CREATE TABLE t (a int);\n"
+    assert "-" not in os.listdir(".")
+
+
+def test_dump_several_to_stdout(cli, server):
+    result = cli("db", "dump", "db1", "db2", "-")
+    assert result.exit_code == 1
+    assert server.paths() == []
+
+
+def _split(sql, size=7):
+    chunks = [sql[i:i + size] for i in range(0, len(sql), size)]
+    return [x for x, _ in databases._statements(iter(chunks))]
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("INSERT INTO t VALUES ('it\\'s; fine');\nSELECT 1;",
+     ["INSERT INTO t VALUES ('it\\'s; fine');", "SELECT 1;"]),
+    ("SET standard_conforming_strings = on;\n"
+     "INSERT INTO t VALUES ('C:\\');\nINSERT INTO t VALUES ('D:\\');",
+     ["SET standard_conforming_strings = on;",
+      "INSERT INTO t VALUES ('C:\\');", "INSERT INTO t VALUES ('D:\\');"]),
+    ("SET standard_conforming_strings = on;\n"
+     "INSERT INTO t VALUES (E'it\\'s; fine', 'x');\nSELECT 1;",
+     ["SET standard_conforming_strings = on;",
+      "INSERT INTO t VALUES (E'it\\'s; fine', 'x');", "SELECT 1;"]),
+    ("-- C:\\\nSELECT 1;\n/* D:\\*/ SELECT 2;",
+     ["-- C:\\\nSELECT 1;", "/* D:\\*/ SELECT 2;"]),
+    ("CREATE FUNCTION f() AS $body$ SELECT 'a;'; $body$;\nSELECT 1;",
+     ["CREATE FUNCTION f() AS $body$ SELECT 'a;'; $body$;", "SELECT 1;"])
+])
+def test_statements(sql, expected):
+    assert _split(sql) == expected
+    assert _split(sql, 1) == expected
+
+
+def test_load_does_not_retry_rejected_sql(cli, server, isolated,
+                                           monkeypatch):
+    monkeypatch.setattr(databases.time, "sleep", lambda x: None)
+    server.routes[("PUT", "/api/databases/mydb")] = (400, {})
+    (isolated / "dump.sql").write_text(u"SELEC 1;\n")
+    result = cli("db", "load", "mydb", str(isolated / "dump.sql"))
+    assert result.exit_code == 1
+    assert server.paths("PUT") == ["/api/databases/mydb"]
+
+
+def test_execute_retries_unreachable_server(monkeypatch):
+    from arkosctl.api import UNREACHABLE
+    from pyarkosclient.errors import GeneralError
+    monkeypatch.setattr(databases.time, "sleep", lambda x: None)
+    calls = []
+
+    class Databases(object):
+        def execute(self, name, sql):
+            calls.append(sql)
+            if len(calls) < 3:
+                raise GeneralError(UNREACHABLE)
+            return "done"
+
+    class Conn(object):
+        databases = Databases()
+
+    assert databases._execute(Conn(), "mydb", "SELECT 1;") == "done"
+    assert len(calls) == 3
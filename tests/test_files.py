@@ -0,0 +1,272 @@
+"""File transfers and folder syncing."""
+import base64
+import json
+import os
+import re
+
+from arkosctl import transfers
+
+DATA = bytes(bytearray(range(256))) * 4
+
+
+class _RemoteFiles(object):
+    """A file tree on the stand-in server, behind its file API.
+
+    `files` maps server paths to `[data, mtime]` and `folders` holds the
+    folders. Every file can be shared and downloaded.
+    """
+
+    def __init__(self, server):
+        self.files, self.folders, self.shares = {}, set(["/"]), []
+        server.fallback = self.handle
+
+    def add(self, path, data, mtime):
+        self.files[path] = [data, mtime]
+        parts = path.split("/")[1:-1]
+        for i in range(len(parts)):
+            self.folders.add("/" + "/".join(parts[:i + 1]))
+
+    def handle(self, handler, body):
+        path = handler.path.split("?")[0]
+        if path.startswith("/api/files/"):
+            target = base64.b64decode(
+                path[11:].replace("*", "="), b"+-").decode("utf-8")
+            if handler.command == "POST":
+                return self._create(handler, target, body)
+            if target in self.files:
+                return handler.send_json(200, {"file": {
+                    "size": len(self.files[target][0])}})
+            if target in self.folders:
+                return handler.send_json(200, {"files": self._list(target)})
+        elif path == "/api/shares":
+            self.shares.append(json.loads(body)["share"]["path"])
+            return handler.send_json(200, {"share": {
+                "id": str(len(self.shares) - 1)}})
+        elif path.startswith("/api/shares/"):
+            return handler.send_json(200, {})
+        elif path.startswith("/shared/"):
+            data = self.files[self.shares[int(path[8:])]][0]
+            return _send(handler, 200, data,
+                         {"Content-Length": str(len(data))})
+        handler.send_json(404)
+
+    def _list(self, folder):
+        prefix = folder.rstrip("/") + "/"
+        items = []
+        for x in sorted(self.folders):
+            if x.startswith(prefix) and "/" not in x[len(prefix):]:
+                items.append({"name": x[len(prefix):], "folder": True})
+        for x, (data, mtime) in sorted(self.files.items()):
+            if x.startswith(prefix) and "/" not in x[len(prefix):]:
+                items.append({"name": x[len(prefix):], "size": len(data),
+                              "mtime": mtime})
+        return items
+
+    def _create(self, handler, folder, body):
+        if folder not in self.folders:
+            return handler.send_json(404)
+        prefix = folder.rstrip("/") + "/"
+        if handler.headers.get("Content-Type", "").startswith("multipart"):
+            head, _, rest = body.partition(b"\r\n\r\n")
+            name = re.search(b'filename="([^"]*)"', head).group(1)
+            self.files[prefix + name.decode("utf-8")] = [
+                rest[:rest.rindex(b"\r\n--")], 2000000000]
+        else:
+            self.folders.add(prefix + json.loads(body)["file"]["name"])
+        handler.send_json(200, {})
+
+
+def _shares(server, serve):
+    """Share every file as /shared/S1 and answer downloads with `serve`.
+
+    `serve` is called with the request handler and the headers of every
+    download request so far, which are also returned.
+    """
+    seen = []
+
+    def download(handler, body):
+        seen.append(dict(handler.headers.items()))
+        serve(handler, seen)
+    server.routes[("POST", "/api/shares")] = (200, {"share": {"id": "S1"}})
+    server.routes[("DELETE", "/api/shares/S1")] = (200, {})
+    server.routes[("GET", "/shared/S1")] = download
+    return seen
+
+
+def _send(handler, status, data, headers):
+    handler.send_response(status)
+    for k, v in headers.items():
+        handler.send_header(k, v)
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+def _interrupted_then_ranged(handler, seen):
+    """Cut the first download short; answer the next with its range."""
+    if len(seen) == 1:
+        _send(handler, 200, DATA[:400], {
+            "Content-Length": str(len(DATA)), "ETag": '"v1"'})
+        handler.close_connection = True
+        return
+    start = int(seen[-1]["Range"].split("=")[1].rstrip("-"))
+    _send(handler, 206, DATA[start:], {
+        "Content-Length": str(len(DATA) - start), "ETag": '"v1"',
+        "Content-Range": "bytes {0}-{1}/{2}".format(
+            start, len(DATA) - 1, len(DATA))})
+
+
+def test_download_resumes_with_range(cli, server, isolated, monkeypatch):
+    monkeypatch.setattr(transfers, "CHUNK_SIZE", 100)
+    seen = _shares(server, _interrupted_then_ranged)
+    out = str(isolated / "data.bin")
+    result = cli("file", "download", "/srv/data.bin", out)
+    assert result.exit_code == 1
+    assert "run the same command again" in result.output
+    assert os.path.getsize(out + ".part") == 400
+    result = cli("file", "download", "/srv/data.bin", out)
+    assert result.exit_code == 0, result.output
+    assert seen[1]["Range"] == "bytes=400-"
+    assert seen[1]["If-Range"] == '"v1"'
+    with open(out, "rb") as f:
+        assert f.read() == DATA
+    assert sorted(os.listdir(str(isolated))) == ["cache", "data.bin"]
+
+
+def test_download_starts_over_when_file_changed(cli, server, isolated,
+                                                monkeypatch):
+    monkeypatch.setattr(transfers, "CHUNK_SIZE", 100)
+
+    def serve(handler, seen):
+        if len(seen) == 1:
+            _interrupted_then_ranged(handler, seen)
+        else:
+            # If-Range did not match: the whole new file comes back.
+            _send(handler, 200, DATA[::-1], {
+                "Content-Length": str(len(DATA)), "ETag": '"v2"'})
+    seen = _shares(server, serve)
+    out = str(isolated / "data.bin")
+    cli("file", "download", "/srv/data.bin", out)
+    result = cli("file", "download", "/srv/data.bin", out)
+    assert result.exit_code == 0, result.output
+    assert seen[1]["Range"] == "bytes=400-"
+    with open(out, "rb") as f:
+        assert f.read() == DATA[::-1]
+
+
+def test_download_checks_sha256(cli, server, isolated):
+    _shares(server, lambda handler, seen: _send(
+        handler, 200, DATA, {"Content-Length": str(len(DATA))}))
+    out = str(isolated / "data.bin")
+    result = cli("file", "download", "/srv/data.bin", out,
+                 "--sha256", "0" * 64)
+    assert result.exit_code == 1
+    assert "Checksum mismatch" in result.output
+    assert not os.path.exists(out) and not os.path.exists(out + ".part")
+
+
+def test_upload_streams_whole_file(cli, server, isolated):
+    remote = _RemoteFiles(server)
+    remote.folders.add("/srv")
+    path = isolated / "data.bin"
+    path.write_bytes(DATA)
+    result = cli("file", "upload", str(path), "/srv")
+    assert result.exit_code == 0, result.output
+    assert remote.files["/srv/data.bin"][0] == DATA
+    assert len(server.paths("POST")) == 1
+
+
+def test_upload_retried_as_a_whole(cli, server, isolated, monkeypatch):
+    monkeypatch.setattr(transfers.time, "sleep", lambda s: None)
+    remote = _RemoteFiles(server)
+    remote.folders.add("/srv")
+    failures = []
+
+    def flaky(handler, body):
+        if not failures:
+            failures.append(body)
+            return handler.send_json(500, {"message": "Try again"})
+        remote.handle(handler, body)
+    server.routes[("POST", "/api/files/" + transfers.encode_path("/srv"))] \
+        = flaky
+    path = isolated / "data.bin"
+    path.write_bytes(DATA)
+    result = cli("file", "upload", str(path), "/srv")
+    assert result.exit_code == 0, result.output
+    assert DATA in failures[0]
+    assert remote.files["/srv/data.bin"][0] == DATA
+    assert len(server.paths("POST")) == 2
+
+
+def test_upload_checks_size_on_server(cli, server, isolated):
+    remote = _RemoteFiles(server)
+    remote.folders.add("/srv")
+
+    def truncated(handler, body):
+        remote.handle(handler, body)
+        remote.files["/srv/data.bin"][0] = DATA[:10]
+    server.routes[("POST", "/api/files/" + transfers.encode_path("/srv"))] \
+        = truncated
+    path = isolated / "data.bin"
+    path.write_bytes(DATA)
+    result = cli("file", "upload", str(path), "/srv")
+    assert result.exit_code == 1
+    assert "is incomplete: 10.0 bytes of 1.0 Kb" in result.output
+
+
+def _local(root, files):
+    """Write `{relative path: (data, mtime)}` under a local folder."""
+    for rel, (data, mtime) in files.items():
+        path = root.joinpath(*rel.split("/"))
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        path.write_bytes(data)
+        os.utime(str(path), (mtime, mtime))
+
+
+def test_sync_push_plan(cli, server, isolated):
+    remote = _RemoteFiles(server)
+    remote.add("/srv/same.txt", b"12345", 1500)
+    remote.add("/srv/size.txt", b"123", 1500)
+    remote.add("/srv/newer.txt", b"12345", "1970-01-01T00:25:00Z")
+    remote.add("/srv/remote-only.txt", b"x", 1500)
+    local = isolated / "site"
+    _local(local, {
+        "new.txt": (b"abc", 1000), "same.txt": (b"abcde", 1000),
+        "size.txt": (b"abcde", 1000), "newer.txt": (b"abcde", 3000),
+        "sub/deep/new.txt": (b"abcdef", 1000)})
+    result = cli("file", "sync", str(local), "/srv", "--dry-run")
+    assert result.exit_code == 0, result.output
+    lines = [x.split() for x in result.output.splitlines()
+             if x.startswith("upload")]
+    assert [(x[1], x[-1]) for x in lines] == [
+        ("new.txt", "new)"), ("newer.txt", "newer)"), ("size.txt", "size)"),
+        ("sub/deep/new.txt", "new)")]
+    assert "4 files" in result.output
+    assert server.paths("POST") == []
+    result = cli("file", "sync", str(local), "/srv")
+    assert result.exit_code == 0, result.output
+    assert "Copied 4 files" in result.output
+    assert remote.files["/srv/size.txt"][0] == b"abcde"
+    assert remote.files["/srv/newer.txt"][0] == b"abcde"
+    assert remote.files["/srv/sub/deep/new.txt"][0] == b"abcdef"
+    assert remote.files["/srv/same.txt"][0] == b"12345"
+    assert "/srv/remote-only.txt" in remote.files
+    assert set(["/srv/sub", "/srv/sub/deep"]) <= remote.folders
+
+
+def test_sync_pull_sets_times(cli, server, isolated):
+    remote = _RemoteFiles(server)
+    remote.add("/srv/a.txt", b"abc", 1500)
+    remote.add("/srv/sub/b.txt", b"abcd", "1970-01-01T00:50:00Z")
+    local = isolated / "site"
+    _local(local, {"local-only.txt": (b"x", 1000)})
+    result = cli("file", "sync", str(local), "/srv", "--pull")
+    assert result.exit_code == 0, result.output
+    assert (local / "a.txt").read_bytes() == b"abc"
+    assert (local / "sub" / "b.txt").read_bytes() == b"abcd"
+    assert os.path.getmtime(str(local / "a.txt")) == 1500
+    assert os.path.getmtime(str(local / "sub" / "b.txt")) == 3000
+    assert (local / "local-only.txt").exists()
+    result = cli("file", "sync", str(local), "/srv", "--pull")
+    assert result.exit_code == 0, result.output
+    assert "0 files" in result.output
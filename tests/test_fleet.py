@@ -0,0 +1,55 @@
+"""Running a command line on groups of hosts."""
+import json
+import os
+
+import pytest
+
+from arkosctl import main
+from conftest import Runner, StubServer
+
+
+@pytest.fixture
+def fleet(isolated, monkeypatch):
+    """Two inventory hosts in group 'web', and a default host in .arkosrc."""
+    servers = dict((x, StubServer()) for x in ("default", "web1", "web2"))
+    for x in servers.values():
+        x.routes[("GET", "/api/system/services")] = (200, {"services": [
+            {"id": "nginx", "state": "running", "enabled": True}]})
+    (isolated / ".arkosrc").write_text(
+        u"[arkosrc]\nhost = {0}\nuser = admin\npassword = secret\n"
+        u"apikey = defaultkey\n".format(servers["default"].url))
+    inventory = isolated / "hosts"
+    inventory.write_text(
+        u"[web1]\nhost = {0}\nuser = admin\npassword = secret\n"
+        u"groups = web\n\n[web2]\nhost = {1}\napikey = web2key\n"
+        u"groups = web\n".format(servers["web1"].url, servers["web2"].url))
+    monkeypatch.setenv("ARKOS_CLI_INVENTORY", str(inventory))
+    monkeypatch.setenv("PYTHONPATH", os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__))))
+    yield servers
+    for x in servers.values():
+        x.close()
+
+
+def test_runs_on_each_inventory_host(fleet):
+    result = Runner().invoke(main, ["--hosts", "web", "svc", "list"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert sorted(x.split("|")[0].strip() for x in lines) == \
+        ["web1", "web2"]
+    assert all("nginx" in x for x in lines)
+    assert fleet["default"].requests == []
+    assert fleet["web1"].paths() == ["/api/system/services"]
+    assert fleet["web2"].paths() == ["/api/ping", "/api/system/services"]
+
+
+def test_does_not_send_default_credentials(fleet, isolated):
+    (isolated / "hosts").write_text(
+        u"[web1]\nhost = {0}\ngroups = web\n".format(fleet["web1"].url))
+    result = Runner().invoke(
+        main, ["--hosts", "web", "--hosts-format", "json", "svc", "list"])
+    assert result.exit_code == 1
+    results, _ = json.JSONDecoder().raw_decode(result.output)
+    assert "No connection information" in results[0]["stderr"]
+    assert fleet["default"].requests == []
+    assert fleet["web1"].requests == []
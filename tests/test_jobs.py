@@ -0,0 +1,143 @@
+"""Jobs started without waiting, and following jobs to completion."""
+import itertools
+import json
+import random
+import time
+
+import pytest
+from pyarkosclient import Job
+
+from arkosctl import CLIException, utils
+from arkosctl.journal import JobJournal
+from arkosctl.utils import handle_job, PollPolicy
+
+
+def _job_routes(server, status=201):
+    server.routes[("PUT", "/api/apps/foo")] = (
+        202, {"app": {"id": "foo"}}, {"Location": "/api/jobs/J1"})
+    server.routes[("GET", "/api/jobs/J1")] = (status, {
+        "level": "success", "title": "None", "message": "Installed foo"})
+
+
+def test_no_wait_records_job(cli, server):
+    _job_routes(server)
+    result = cli("app", "install", "foo", "--no-wait")
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == "J1"
+    entry = JobJournal().get("J1")
+    assert (entry["status"], entry["label"]) == ("running", "foo")
+    assert "/api/jobs/J1" not in server.paths()
+
+
+def test_no_wait_does_not_leak_into_later_lines(cli, server, tmp_path):
+    _job_routes(server)
+    script = tmp_path / "script"
+    script.write_text(u"app install foo --no-wait\njob wait J1\n")
+    result = cli("batch", str(script))
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines().count("J1") == 1
+    assert "Job J1 finished" in result.output
+    entry = JobJournal().get("J1")
+    assert (entry["command"], entry["status"]) == \
+        ("arkosctl app install", "success")
+    assert "/api/jobs/J1" in server.paths()
+
+
+def _events(events, interval=0.0):
+    """Route sending `(event, message)` pairs as Server-Sent Events."""
+    def route(handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        try:
+            for event, message in events:
+                time.sleep(interval)
+                handler.wfile.write("event: {0}\ndata: {1}\n\n".format(
+                    event, json.dumps(message)).encode("utf-8"))
+                handler.wfile.flush()
+        except (IOError, OSError):
+            pass
+    return route
+
+
+def _message(text, level="info"):
+    return {"level": level, "title": "None", "message": text}
+
+
+def test_streams_messages_without_polling(server, capsys):
+    server.routes[("GET", "/api/jobs/J1")] = _events([
+        ("message", _message("Downloading")),
+        ("message", _message("Installing")),
+        ("success", _message("Installed", "success"))
+    ], 0.05)
+    start = time.time()
+    handle_job(Job(server.url, "J1"), PollPolicy(initial=30))
+    assert time.time() - start < 5
+    out = capsys.readouterr().out
+    assert out.index("Downloading") < out.index("Installing") < \
+        out.index("Installed")
+    assert server.paths() == ["/api/jobs/J1"]
+
+
+def test_stream_stops_at_timeout(server):
+    server.routes[("GET", "/api/jobs/J1")] = _events(
+        [("message", _message("Still working"))] * 100, 0.1)
+    start = time.time()
+    with pytest.raises(CLIException) as e:
+        handle_job(Job(server.url, "J1"), PollPolicy(timeout=0.5), echo=False)
+    assert "Timed out" in e.value.message
+    assert time.time() - start < 2
+
+
+def test_falls_back_to_polling(server):
+    answers = [(200, _message("Working")), (200, _message("Working")),
+               (201, _message("Done", "success"))]
+    server.routes[("GET", "/api/jobs/J1")] = \
+        lambda handler, body: handler.send_json(*answers.pop(0))
+    job = Job(server.url, "J1")
+    handle_job(job, PollPolicy(initial=0.01), echo=False)
+    assert job.status == "success"
+    assert server.paths() == ["/api/jobs/J1"] * 3
+
+
+def _delays(policy, count):
+    return list(itertools.islice(policy.delays(), count))
+
+
+def test_poll_delays_grow_to_cap():
+    policy = PollPolicy(initial=1, maximum=5, factor=2, jitter=0)
+    assert _delays(policy, 6) == [1, 2, 4, 5, 5, 5]
+
+
+@pytest.mark.parametrize("pick, expected", [
+    (min, [0.9, 1.8, 3.6, 3.6]),
+    (max, [1.1, 2.2, 4.4, 4.4])
+])
+def test_poll_jitter_bounds(monkeypatch, pick, expected):
+    monkeypatch.setattr(utils.random, "uniform", lambda a, b: pick(a, b))
+    policy = PollPolicy(initial=1, maximum=4, factor=2, jitter=0.1)
+    assert _delays(policy, 4) == pytest.approx(expected)
+
+
+def test_poll_jitter_spread(monkeypatch):
+    monkeypatch.setattr(utils, "random", random.Random(7))
+    delays = _delays(PollPolicy(initial=2, maximum=2, jitter=0.25), 200)
+    assert all(1.5 <= x <= 2.5 for x in delays)
+    assert max(delays) - min(delays) > 0.5
+
+
+def test_poll_options(cli, server, monkeypatch):
+    answers = [(200, _message("Working"))] * 5 + \
+        [(201, _message("Done", "success"))]
+    server.routes[("PUT", "/api/apps/foo")] = (
+        202, {"app": {"id": "foo"}}, {"Location": "/api/jobs/J1"})
+    server.routes[("GET", "/api/jobs/J1")] = \
+        lambda handler, body: handler.send_json(*answers.pop(0))
+    slept = []
+    monkeypatch.setattr(utils.random, "uniform", lambda a, b: 0)
+    monkeypatch.setattr(utils.time, "sleep", slept.append)
+    result = cli("--poll-min", "1", "--poll-max", "3", "app", "install", "foo")
+    assert result.exit_code == 0, result.output
+    assert slept == [1, 1.5, 2.25, 3, 3]
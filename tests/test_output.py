@@ -0,0 +1,45 @@
+"""Listings in each output format."""
+import json
+
+import pytest
+
+ASSIGNS = [{"type": "website", "id": "blog", "name": "My Blog"},
+           {"type": "app", "id": "xmpp", "name": "XMPP Chat"}]
+
+
+@pytest.fixture
+def assigns(server):
+    server.routes[("GET", "/api/assignments")] = (
+        200, {"assignments": ASSIGNS})
+
+
+def test_text(cli, assigns):
+    result = cli("cert", "assigns")
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[1:] == [
+        "My Blog   (Website)", "XMPP Chat (App)"]
+
+
+def test_json(cli, assigns):
+    result = cli("-o", "json", "cert", "assigns")
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output) == ASSIGNS
+
+
+def test_ndjson(cli, assigns):
+    result = cli("-o", "ndjson", "cert", "assigns")
+    assert result.exit_code == 0, result.output
+    assert [json.loads(x) for x in result.output.splitlines()] == ASSIGNS
+
+
+def test_csv(cli, assigns):
+    result = cli("-o", "csv", "cert", "assigns")
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "id,name,type", "blog,My Blog,website", "xmpp,XMPP Chat,app"]
+
+
+def test_empty_listing(cli, server):
+    server.routes[("GET", "/api/assignments")] = (200, {"assignments": []})
+    assert cli("-o", "json", "cert", "assigns").output == "[]\n"
+    assert cli("-o", "csv", "cert", "assigns").output == "\n"
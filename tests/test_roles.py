@@ -0,0 +1,84 @@
+"""User and group commands."""
+import base64
+import json
+import os
+
+
+def _users(server, reject=()):
+    """Accept new users except those named in `reject`; return them all."""
+    added = []
+
+    def add(handler, body):
+        user = json.loads(body)["user"]
+        if user["name"] in reject:
+            return handler.send_json(400, {"message": "Name is taken"})
+        added.append(user)
+        handler.send_json(200, {"user": {"id": len(added),
+                                         "name": user["name"]}})
+    server.routes[("POST", "/api/system/users")] = add
+    return added
+
+
+def test_import_csv_reports_rows_and_resumes(cli, server, isolated):
+    path = isolated / "users.csv"
+    path.write_text(
+        u"name,password,domain,first_name,last_name,admin,sudo\n"
+        u"alice,pw1,example.com,Alice,Smith,yes,\n"
+        u"bob,,example.com,Bob,,,\n"
+        u"carol,pw3,,Carol,,,1\n"
+        u"dave,pw4,example.com,Dave,,,\n")
+    checkpoint = str(isolated / "import.done")
+    added = _users(server, reject=["dave"])
+    result = cli("user", "import", str(path), "--domain", "example.org",
+                 "--checkpoint", checkpoint)
+    assert result.exit_code == 1
+    assert "Line 3 (bob): A name and a password are required" \
+        in result.output
+    assert "Line 5 (dave): " in result.output
+    assert "2 of 4 users could not be imported" in result.output
+    assert [(x["name"], x["domain"], x["admin"], x["sudo"]) for x in
+            sorted(added, key=lambda x: x["name"])] == [
+        ("alice", "example.com", True, False),
+        ("carol", "example.org", False, True)]
+    with open(checkpoint) as f:
+        assert sorted(f.read().split()) == ["alice", "carol"]
+
+    path.write_text(path.read_text().replace(u"bob,,", u"bob,pw2,"))
+    added = _users(server)
+    result = cli("user", "import", str(path), "--checkpoint", checkpoint)
+    assert result.exit_code == 0, result.output
+    assert sorted(x["name"] for x in added) == ["bob", "dave"]
+    assert "Imported 2 users" in result.output
+    assert not os.path.exists(checkpoint)
+
+
+def test_import_ldif(cli, server, isolated):
+    password = base64.b64encode(u"p\u00e4ss".encode("utf-8")).decode()
+    path = isolated / "users.ldif"
+    path.write_text(
+        u"# exported users\n"
+        u"dn: ou=people,dc=example,dc=com\n"
+        u"objectClass: organizationalUnit\n"
+        u"\n"
+        u"dn: uid=alice,ou=people,dc=example,dc=com\n"
+        u"uid: alice\n"
+        u"userPassword: secret\n"
+        u"mail: alice@example.com\n"
+        u"givenName: Ali\n"
+        u" ce\n"
+        u"sn: Smith\n"
+        u"\n"
+        u"dn: uid=bob,ou=people,dc=example,dc=com\n"
+        u"uid: bob\n"
+        u"userPassword:: " + password + u"\n"
+        u"mail: bob@example.org\n"
+        u"cn: Bob\n")
+    added = _users(server)
+    result = cli("user", "import", str(path))
+    assert result.exit_code == 0, result.output
+    assert sorted((x["name"], x["passwd"], x["domain"], x["first_name"],
+                   x["last_name"]) for x in added) == [
+        ("alice", "secret", "example.com", "Alice", "Smith"),
+        ("bob", u"p\u00e4ss", "example.org", "Bob", "")]
+    assert not [x for x in os.listdir(str(isolated / "cache" / "arkosctl"))
+                if x.startswith("import-")]
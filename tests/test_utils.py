@@ -0,0 +1,130 @@
+"""Job tracking and thread pool helpers."""
+import threading
+import time
+
+import pytest
+
+from arkosctl.utils import JobManager, PollPolicy, run_parallel
+
+
+class FakeJob(object):
+    """A job that succeeds after a number of checks, or fails to check."""
+
+    def __init__(self, checks=1, error=None):
+        self.host, self.id = "http://stub", "J1"
+        self.status, self.message = "running", None
+        self.checks, self.error = checks, error
+
+    def check(self):
+        if self.error:
+            raise self.error
+        self.checks -= 1
+        if not self.checks:
+            self.status = "success"
+        return self.status
+
+
+def test_run_parallel_reports_errors():
+    def func(x):
+        if x == 2:
+            raise ValueError("two")
+        return x * 10
+    results = sorted(run_parallel(func, [1, 2, 3], 2), key=lambda x: x[0])
+    assert [(x, r) for x, r, _ in results] == [(1, 10), (2, None), (3, 30)]
+    assert str(results[1][2]) == "two"
+
+
+def test_run_parallel_limits_running_calls():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def func(x):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+    assert len(list(run_parallel(func, range(20), 3))) == 20
+    assert peak[0] <= 3
+
+
+def test_run_parallel_stops_starting_items():
+    seen = []
+    results = list(run_parallel(seen.append, range(10), 1,
+                                lambda: len(seen) >= 3))
+    assert len(results) == 3
+
+
+def test_job_manager_survives_failing_checks(capsys):
+    jobs = JobManager(PollPolicy(initial=0.01, maximum=0.01))
+    jobs.launch("broken", lambda: FakeJob(error=IOError("unreachable")))
+    jobs.launch("fine", lambda: FakeJob(checks=2))
+    assert jobs.wait() == 1
+    status = dict((x["label"], (x["status"], x["error"]))
+                  for x in jobs.entries)
+    assert status == {"broken": ("failed", "unreachable"),
+                      "fine": ("success", None)}
+    assert "unreachable" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("parallel", ["1", "4"])
+def test_service_operations_report_each_failure(cli, server, parallel):
+    server.routes[("PUT", "/api/system/services/nginx")] = (200, {
+        "service": {"id": "nginx", "state": "running", "enabled": True}})
+    server.routes[("PUT", "/api/system/services/php")] = (500, {})
+    result = cli("svc", "restart", "nginx", "php", "--parallel", parallel)
+    assert result.exit_code == 1
+    assert "nginx" in result.output and "php" in result.output
+    assert "1 of 2 services could not be restarted" in result.output
+
+
+def test_service_operation_failing_on_one_target(cli, server):
+    server.routes[("PUT", "/api/system/services/nginx")] = (200, {
+        "service": {"id": "nginx", "state": "failed", "enabled": True}})
+    result = cli("svc", "start", "nginx")
+    assert result.exit_code == 1
+    assert "Failed to start nginx" in result.output
+
+
+def test_service_operation_results_aligned(cli, server):
+    server.routes[("PUT", "/api/system/services/nginx")] = (200, {
+        "service": {"id": "nginx", "state": "running", "enabled": True}})
+    server.routes[("PUT", "/api/system/services/php-fpm")] = (200, {
+        "service": {"id": "php-fpm", "state": "stopped", "enabled": False}})
+    result = cli("svc", "stop", "nginx", "php-fpm")
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "nginx     Running   Enabled", "php-fpm   Stopped   Disabled"]
+
+
+class _Terminal(object):
+    def isatty(self):
+        return True
+
+
+def test_job_manager_shows_failed_starts_on_terminal(monkeypatch, capsys):
+    import click
+    monkeypatch.setattr(click, "get_text_stream", lambda name: _Terminal())
+
+    def refuse(name):
+        raise IOError("{0} refused".format(name))
+    jobs = JobManager(PollPolicy(initial=0.01, maximum=0.01))
+    jobs.launch("alpha", refuse, "alpha")
+    jobs.launch("beta", refuse, "beta")
+    assert jobs.wait() == 2
+    out = capsys.readouterr().out
+    assert "alpha refused" in out and "beta refused" in out
+
+
+def test_cache_path_created_by_another_process(isolated, monkeypatch):
+    import os
+    from arkosctl import utils
+    makedirs = os.makedirs
+
+    def racing(path, mode=0o777, **kwargs):
+        makedirs(path, mode, **kwargs)
+        raise OSError(17, "File exists")
+    monkeypatch.setattr(utils.os, "makedirs", racing)
+    assert utils.cache_path("x") == \
+        str(isolated / "cache" / "arkosctl" / "x")